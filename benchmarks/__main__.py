@@ -0,0 +1,38 @@
+'''
+Runs the benchmark suite from the repo root:
+
+    python -m benchmarks                         # all benchmarks, scales 1/100/10000, pmt_freq 12/26/365
+    python -m benchmarks --quick -o new.json     # scales 1/100 at pmt_freq 12
+    python -m benchmarks -b Loan.rent_vs_buy --scales 100 --freqs 12 26
+    python -m benchmarks --compare old.json new.json
+'''
+import argparse
+import json
+
+from .suite import BENCHMARKS, SCALES, PMT_FREQS, run, compare
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    parser.add_argument('-b', '--benchmarks', nargs='+', choices=list(BENCHMARKS), help='benchmarks to run (default all)')
+    parser.add_argument('--scales', nargs='+', type=int, default=list(SCALES))
+    parser.add_argument('--freqs', nargs='+', type=int, default=list(PMT_FREQS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--quick', action='store_true', help='scales 1 and 100 at pmt_freq 12 only')
+    parser.add_argument('-o', '--output', default='benchmark_results.json', help='JSON results file')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two JSON results files')
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f_old, open(args.compare[1]) as f_new:
+            print(compare(json.load(f_old), json.load(f_new)).to_string(index=False))
+        return
+
+    if args.quick:
+        args.scales, args.freqs = [1, 100], [12]
+    run(args.benchmarks, args.scales, args.freqs, args.repeat, args.output)
+    print('Results written to {}'.format(args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+'''
+Benchmark of Loan.amort_table_detail against the previous row-wise pandas implementation
+
+Run from the repo root:
+    python -m benchmarks.amort_detail
+'''
+import timeit
+import numpy as np
+
+from loan.core import Loan
+from loan.loan_input import LoanInput
+
+
+def legacy_amort_table_detail(loan: Loan):
+    '''
+    Previous implementation of Loan.amort_table_detail (apply for pmi, groupby + merge for yearly values)
+    '''
+    df = loan.amort_table.copy()
+    df['home_value'] = loan.asset_start_value * np.array([1+(loan.appr_rate/loan.pmt_freq)]*loan.nper).cumprod()
+    df['ltv_ratio'] = df['end_bal'] / df['home_value']
+    df['pmi'] =  df['ltv_ratio'].apply(lambda x: loan.amt*.01/loan.pmt_freq if x > .8 else 0)
+
+    df_tax_maint = df[['year', 'home_value']].groupby('year').min()
+    df_tax_maint['prop_tax'] = df_tax_maint['home_value']*loan.tax/12
+    df_tax_maint['maint'] = df_tax_maint['home_value']*loan.maint/12
+    df = df.merge(df_tax_maint[['prop_tax', 'maint']], how='left', left_on='year', right_index=True)
+
+    if not loan.closing_cost_finance:
+        closing_costs = np.array([0]*loan.nper)
+        closing_costs[0] = loan.closing_cost
+        df['closing_costs'] = closing_costs
+    else:
+        df['closing_costs'] = 0
+
+    costs = df['interest'] + df['pmi'] + df['prop_tax'] + df['maint'] + df['closing_costs']
+    df['cum_costs'] = costs.cumsum()
+
+    df['all_in_pmts'] = df[['pmt', 'pmi', 'prop_tax', 'maint', 'closing_costs']].sum(axis=1)
+    d_pmt = np.array([0]*loan.nper)
+    d_pmt[0] = (loan.asset_start_value * loan.down_pmt)
+    df['down_pmt'] = d_pmt
+    df['all_in_pmts'] = df['all_in_pmts'] + df['down_pmt']
+
+    df['home_sale_cost'] = df['home_value'] * loan.home_sale_percent
+    df['profit'] = df['home_value'] - df['home_sale_cost'] - df['cum_costs'] - loan.asset_start_value*loan.down_pmt - loan.amt
+
+    return df
+
+
+def run(pmt_freqs=(12, 26, 365), num_years=30, repeat=5, number=10):
+    print('{:>8} {:>8} {:>12} {:>12} {:>8}'.format('pmt_freq', 'periods', 'legacy ms', 'vector ms', 'speedup'))
+    for pmt_freq in pmt_freqs:
+        params = LoanInput(asset_amt=300000, rate_annual=.05, num_years=num_years, pmt_freq=pmt_freq,
+                           down_pmt=.1, closing_cost=5000)
+        loan = Loan(params)
+        assert np.allclose(legacy_amort_table_detail(loan)['profit'], loan.amort_table_detail()['profit'])
+
+        legacy = min(timeit.repeat(lambda: legacy_amort_table_detail(loan), repeat=repeat, number=number)) / number
+        vector = min(timeit.repeat(loan.amort_table_detail, repeat=repeat, number=number)) / number
+        print('{:>8} {:>8} {:>12.2f} {:>12.2f} {:>7.1f}x'.format(pmt_freq, loan.nper, legacy*1000, vector*1000, legacy/vector))
+
+
+if __name__ == '__main__':
+    run()
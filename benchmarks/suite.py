@@ -0,0 +1,213 @@
+'''
+Benchmarks of the loan, comparison and forecasting hot paths
+
+Each benchmark builds its inputs for a scale (number of loans, applicants or 10x rows for LinReg)
+and payment frequency, then times the whole scale. Memory is measured with tracemalloc on a separate
+run of the first prepared function so tracing doesn't skew the timings. A run is one call for per
+item benchmarks but the whole scale for batched ones (items_per_run), and tracemalloc reports the
+peak and the blocks still allocated after the run (net_blocks, including its result), not the
+number of allocations made during it.
+'''
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import warnings
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from loan.core import Loan
+from loan.batch import LoanBatch
+from loan.loan_input import LoanInput
+from loan.compare_down_pmts import CompareDownPayments
+from utils.npf_amort import amort
+from utils.utils import pmt_matrix, affordability_calc
+
+SCALES = (1, 100, 10000)
+PMT_FREQS = (12, 26, 365)
+
+
+def random_loans(n: int, pmt_freq: int, seed: int=0) -> list:
+    rng = np.random.default_rng(seed)
+    return [Loan(LoanInput(asset_amt=rng.uniform(150000, 900000), rate_annual=rng.uniform(.02, .08),
+                           num_years=int(rng.choice([15, 30])), pmt_freq=pmt_freq, down_pmt=rng.uniform(0, .3)))
+            for _ in range(n)]
+
+
+def bench_amort(scale, pmt_freq):
+    loans = random_loans(min(scale, 100), pmt_freq)
+    return [lambda l=l: amort(l.amt, l.nper, l.pmt, l.pmt_freq, l.rate) for l in loans], scale
+
+
+def bench_batch_amort(scale, pmt_freq):
+    loans = random_loans(min(scale, 100), pmt_freq)
+    params = {'asset_amt': np.resize([l.asset_start_value for l in loans], scale),
+              'rate_annual': np.resize([l.rate_annual for l in loans], scale),
+              'num_years': np.resize([l.num_years for l in loans], scale),
+              'down_pmt': np.resize([l.down_pmt for l in loans], scale)}
+
+    def run():
+        batch = LoanBatch(pmt_freq=pmt_freq, **params)
+        return batch.end_bal
+    return [run], 1
+
+
+def bench_amort_table_detail(scale, pmt_freq):
+    loans = random_loans(min(scale, 100), pmt_freq)
+    return [l.amort_table_detail for l in loans], scale
+
+
+def bench_rent_vs_buy(scale, pmt_freq):
+    loans = random_loans(min(scale, 100), pmt_freq)
+    return [lambda l=l: l.rent_vs_buy(1800, .03) for l in loans], scale
+
+
+def bench_compare_down_pmts(scale, pmt_freq):
+    loan = random_loans(1, pmt_freq)[0]
+    down_pmts = np.linspace(0, .975, scale).tolist()
+
+    def run():
+        cdp = CompareDownPayments(loan, down_pmts)
+        cdp.get_compare_down_pmts_data()
+        cdp.compare_down_pmts()
+        return cdp.get_summary()
+    return [run], 1
+
+
+def bench_compare_down_pmts_sweep(scale, pmt_freq):
+    loan = random_loans(1, pmt_freq)[0]
+    down_pmts = np.linspace(0, .975, scale).tolist()
+
+    def run():
+        cdp = CompareDownPayments(loan, down_pmts)
+        cdp.sweep_down_pmts()
+        return cdp.get_summary()
+    return [run], 1
+
+
+def bench_pmt_matrix(scale, pmt_freq):
+    loans = random_loans(min(scale, 100), pmt_freq)
+    return [lambda l=l: pmt_matrix(l) for l in loans], scale
+
+
+def bench_affordability_calc(scale, pmt_freq):
+    incomes = np.random.default_rng(0).uniform(40000, 400000, min(scale, 100))
+    return [lambda i=i: affordability_calc(i, amt=350000) for i in incomes], scale
+
+
+def bench_linreg_test(scale, pmt_freq):
+    from models.models import LinReg
+    rng = np.random.default_rng(0)
+    n = max(10*scale, 30)
+    x = pd.DataFrame({'ffr': rng.uniform(0, 5, n), 'cpi': rng.uniform(0, 8, n)})
+    y = 2 + .8*x['ffr'] + .1*x['cpi'] + rng.normal(0, .3, n)
+    lm = LinReg(x, y)
+    return [lm.test], 1
+
+
+def bench_linreg_test_fast(scale, pmt_freq):
+    (lm_test,), calls = bench_linreg_test(scale, pmt_freq)
+    return [lambda: lm_test(fast=True)], calls
+
+
+# name -> (setup, uses pmt_freq)
+BENCHMARKS = {'amort': (bench_amort, True),
+              'LoanBatch': (bench_batch_amort, True),
+              'Loan.amort_table_detail': (bench_amort_table_detail, True),
+              'Loan.rent_vs_buy': (bench_rent_vs_buy, True),
+              'CompareDownPayments': (bench_compare_down_pmts, True),
+              'CompareDownPayments.sweep_down_pmts': (bench_compare_down_pmts_sweep, True),
+              'pmt_matrix': (bench_pmt_matrix, True),
+              'affordability_calc': (bench_affordability_calc, False),
+              'LinReg.test': (bench_linreg_test, False),
+              'LinReg.test fast': (bench_linreg_test_fast, False)}
+
+
+def measure(name: str, scale: int, pmt_freq: int, repeat: int=3) -> dict:
+    '''
+    Times one benchmark at one scale, calls cycle through the prepared functions
+    '''
+    setup, _ = BENCHMARKS[name]
+    funcs, calls = setup(scale, pmt_freq)
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for i in range(calls):
+            funcs[i % len(funcs)]()
+        times.append(time.perf_counter() - start)
+    wall = min(times)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    result = funcs[0]()
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    net_blocks = sum(s.count_diff for s in after.compare_to(before, 'filename'))
+    del result
+
+    return {'name': name, 'scale': scale, 'pmt_freq': pmt_freq, 'calls': calls,
+            'wall_s': wall, 'wall_s_per_call': wall / calls, 'items_per_run': scale // calls,
+            'peak_bytes_per_run': peak, 'net_blocks': net_blocks}
+
+
+def metadata() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = None
+    return {'commit': commit or None, 'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(), 'platform': platform.platform(),
+            'numpy': np.__version__, 'pandas': pd.__version__}
+
+
+def run(names=None, scales=SCALES, pmt_freqs=PMT_FREQS, repeat: int=3, output: str=None, verbose: bool=True) -> dict:
+    '''
+    Runs the benchmarks and optionally writes the results as JSON to output
+    '''
+    results = []
+    for name in names or BENCHMARKS:
+        freqs = pmt_freqs if BENCHMARKS[name][1] else pmt_freqs[:1]
+        for pmt_freq in freqs:
+            for scale in scales:
+                with warnings.catch_warnings():
+                    warnings.simplefilter('ignore')
+                    r = measure(name, scale, pmt_freq, repeat)
+                if not BENCHMARKS[name][1]:
+                    r['pmt_freq'] = None
+                results.append(r)
+                if verbose:
+                    print('{name:<38} scale={scale:<6} freq={freq:<5} {wall_s:>9.4f}s total '
+                          '{per_call:>10.3f}ms/call {peak:>10.1f}KB peak/run {blocks:>7} net blocks'.format(
+                              name=name, scale=scale, freq=str(r['pmt_freq']), wall_s=r['wall_s'],
+                              per_call=r['wall_s_per_call']*1000, peak=r['peak_bytes_per_run']/1024,
+                              blocks=r['net_blocks']), file=sys.stderr)
+
+    report = {'meta': metadata(), 'results': results}
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+def compare(old: dict, new: dict) -> pd.DataFrame:
+    '''
+    Joins two JSON reports on (name, scale, pmt_freq) with the speedup of new over old
+    '''
+    keys = ['name', 'scale', 'pmt_freq']
+    # reports written before the memory fields were renamed
+    renamed = {'peak_bytes_per_call': 'peak_bytes_per_run', 'alloc_blocks_per_call': 'net_blocks'}
+    df_old = pd.DataFrame(old['results']).rename(columns=renamed).fillna({'pmt_freq': 0})
+    df_new = pd.DataFrame(new['results']).rename(columns=renamed).fillna({'pmt_freq': 0})
+    df = df_old.merge(df_new, on=keys, suffixes=('_old', '_new'))
+    df['speedup'] = df['wall_s_old'] / df['wall_s_new']
+    df['peak_ratio'] = df['peak_bytes_per_run_new'] / df['peak_bytes_per_run_old']
+    return df[keys + ['wall_s_old', 'wall_s_new', 'speedup', 'peak_ratio']]
@@ -1,4 +1,8 @@
 #from .econ_data import EconData
 #from .plots import EconPlots
 
-from .fred_econ import FRED
\ No newline at end of file
+from .fred_econ import FRED
+from .cache import ObservationCache
+from .transport import HTTPTransport, RecordingTransport, ReplayTransport
+from .store import SeriesStore
+from .interpolate import interpolate_series
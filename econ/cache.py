@@ -0,0 +1,98 @@
+import os
+import sqlite3
+import time
+import pandas as pd
+
+
+def default_cache_dir() -> str:
+    '''
+    FRED_CACHE_DIR environment variable, else ~/.cache/loanpy/fred
+    '''
+    return os.environ.get('FRED_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'loanpy', 'fred')
+
+
+class ObservationCache():
+    '''
+    SQLite store of FRED observations keyed by (series_id, frequency)
+
+    directory : folder holding fred.sqlite3, created if missing
+
+    Each key keeps the earliest date it was fetched from (start_date), the last observation date
+    and when it was last fetched, so FRED.get_fred_data can serve requests without the network
+    within the series TTL and otherwise only fetch observations from the last cached date onward.
+    Connections are opened per call so the cache can be shared across threads.
+    '''
+
+    def __init__(self, directory: str=None) -> None:
+        self.directory = directory or default_cache_dir()
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, 'fred.sqlite3')
+        with self._connect() as con:
+            con.execute('CREATE TABLE IF NOT EXISTS observations ('
+                        'series_id TEXT, frequency TEXT, date TEXT, value REAL, '
+                        'PRIMARY KEY (series_id, frequency, date))')
+            con.execute('CREATE TABLE IF NOT EXISTS series ('
+                        'series_id TEXT, frequency TEXT, start_date TEXT, last_date TEXT, fetched_at REAL, '
+                        'PRIMARY KEY (series_id, frequency))')
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def meta(self, series_id: str, frequency: str=None) -> dict:
+        '''
+        Returns dict of start_date, last_date and fetched_at (epoch seconds) or None if not cached
+        '''
+        with self._connect() as con:
+            row = con.execute('SELECT start_date, last_date, fetched_at FROM series WHERE series_id=? AND frequency=?',
+                              (series_id, frequency or '')).fetchone()
+        return None if row is None else dict(zip(('start_date', 'last_date', 'fetched_at'), row))
+
+    def is_fresh(self, series_id: str, frequency: str=None, start_date: str=None, ttl: float=0) -> bool:
+        '''
+        True if the key covers start_date and was fetched less than ttl seconds ago
+        '''
+        meta = self.meta(series_id, frequency)
+        if meta is None or (start_date is not None and start_date < meta['start_date']):
+            return False
+        return time.time() - meta['fetched_at'] < ttl
+
+    def read(self, series_id: str, frequency: str=None, start_date: str=None, end_date: str=None) -> pd.DataFrame:
+        '''
+        Returns dataframe of date and value columns between start_date and end_date (inclusive)
+        '''
+        with self._connect() as con:
+            df = pd.read_sql_query('SELECT date, value FROM observations WHERE series_id=? AND frequency=? '
+                                   'AND date >= ? AND date <= ? ORDER BY date', con,
+                                   params=(series_id, frequency or '', start_date or '', end_date or '9999-12-31'))
+        df['date'] = pd.to_datetime(df['date'])
+        return df
+
+    def write(self, series_id: str, frequency: str, start_date: str, df: pd.DataFrame, replace: bool=False) -> None:
+        '''
+        Upserts the date and value columns of df and marks the key as fetched now
+
+        replace : drop the key's observations first, used when start_date moves earlier
+        '''
+        frequency = frequency or ''
+        dates = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+        rows = zip([series_id]*len(df), [frequency]*len(df), dates, df['value'].astype(float))
+        with self._connect() as con:
+            if replace:
+                con.execute('DELETE FROM observations WHERE series_id=? AND frequency=?', (series_id, frequency))
+            con.executemany('INSERT OR REPLACE INTO observations VALUES (?, ?, ?, ?)', rows)
+            start, last = con.execute('SELECT MIN(date), MAX(date) FROM observations WHERE series_id=? AND frequency=?',
+                                      (series_id, frequency)).fetchone()
+            meta = con.execute('SELECT start_date FROM series WHERE series_id=? AND frequency=?',
+                               (series_id, frequency)).fetchone()
+            if meta is not None and not replace:
+                start_date = min(start_date, meta[0])
+            con.execute('INSERT OR REPLACE INTO series VALUES (?, ?, ?, ?, ?)',
+                        (series_id, frequency, start_date, last, time.time()))
+
+    def clear(self, series_id: str=None) -> None:
+        with self._connect() as con:
+            for table in ('observations', 'series'):
+                if series_id is None:
+                    con.execute('DELETE FROM {}'.format(table))
+                else:
+                    con.execute('DELETE FROM {} WHERE series_id=?'.format(table), (series_id,))
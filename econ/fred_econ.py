@@ -1,20 +1,59 @@
 import os
+import sys
 import requests
 import pandas as pd
 import numpy as np
-import json
-import matplotlib.pyplot as plt
-import streamlit as st
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import ObservationCache
+from .transport import transport_from_env
+
+def parse_observations(observations: list) -> pd.DataFrame:
+    '''
+    Returns dataframe of date and value columns from the observations list of a FRED response
+
+    Missing values ('.') are dropped. Dates and values are converted as whole columns.
+    '''
+    dates = np.array([o['date'] for o in observations], dtype=str)
+    values = np.array([o['value'] for o in observations], dtype=str)
+    keep = values != '.'
+    return pd.DataFrame({'date': pd.to_datetime(dates[keep], format='%Y-%m-%d'),
+                         'value': values[keep].astype(float)})
+
+
+# seconds a cached series is served without checking FRED for new observations
+HOUR = 3600
+DEFAULT_TTL = 24*HOUR
 
-from dotenv import load_dotenv, find_dotenv
-load_dotenv()
 
 class FRED:
-    def __init__(self):
-        try:
-            self.api_key = st.secrets["FRED_API_KEY"]
-        except:
-            self.api_key = os.environ.get('fred_api_key')
+    '''
+    Client for FRED series observations
+
+    cache_dir : directory of the observation cache, defaults to FRED_CACHE_DIR or ~/.cache/loanpy/fred
+    cache : False to always request the full date range from FRED
+    ttl : dict of data_id to seconds overriding the default per series TTL
+    max_workers : max concurrent requests of get_many, also the connection pool size of the HTTP transport
+    retries, backoff : retries of rate limited (429) and 5xx responses with exponential backoff
+        of backoff * 2**(retry - 1) seconds, Retry-After headers are respected
+    transport : object with get(url, params) -> dict response body, e.g. HTTPTransport, RecordingTransport
+        or ReplayTransport from econ.transport. Defaults to the FRED_TRANSPORT environment variable
+        (http, record or replay with fixtures in FRED_FIXTURES_DIR). Fixtures are per series and
+        frequency and sliced to the requested dates, so replay works on other days and cache states.
+    '''
+
+    def __init__(self, cache_dir: str=None, cache: bool=True, ttl: dict=None, max_workers: int=4,
+                 retries: int=5, backoff: float=.5, transport=None):
+        from dotenv import load_dotenv
+        load_dotenv()
+        # streamlit secrets inside the app, outside it streamlit is only imported when the env has no key
+        self.api_key = None if 'streamlit' in sys.modules else os.environ.get('fred_api_key')
+        if self.api_key is None:
+            try:
+                import streamlit as st
+                self.api_key = st.secrets["FRED_API_KEY"]
+            except:
+                self.api_key = os.environ.get('fred_api_key')
             
         self.series_url = 'https://api.stlouisfed.org/fred/series/observations'
         self.file_type = 'json'
@@ -33,9 +72,63 @@ class FRED:
                          'private_investment':'GPDI',
                          '10yr_tbill':'DGS10'
                          }
+        # daily series update every business day, weekly mortgage rates on Thursdays
+        self.ttl = {'sofr': 6*HOUR,
+                    'ffr': 6*HOUR,
+                    'usdx': 6*HOUR,
+                    '10yr_tbill': 6*HOUR,
+                    'mgt_rate': 12*HOUR}
+        self.ttl.update(ttl or {})
+        self.cache = ObservationCache(cache_dir) if cache else None
+
+        self.max_workers = max_workers
+        self.transport = transport or transport_from_env(max_workers, retries, backoff)
 
     def get_fred_data(self, data_id: str, start_date: str, end_date: str=None, frequency: str=None) -> pd.DataFrame:
+        '''
+        Returns dataframe of date and data_id columns
+
+        With the cache, requests within the series TTL don't touch the network. Otherwise only
+        observations from the last cached date onward are fetched (the last one is refetched since
+        FRED revises it), or the full history from start_date if it is earlier than the cached range.
+        '''
         fred_id = self.fred_ids[data_id]
+        if self.cache is None:
+            return self._fetch(fred_id, start_date, end_date, frequency).rename(columns={'value': data_id})
+
+        start_date = str(pd.Timestamp(start_date).date())
+        end_date = None if end_date is None else str(pd.Timestamp(end_date).date())
+        ttl = self.ttl.get(data_id, DEFAULT_TTL)
+        if not self.cache.is_fresh(fred_id, frequency, start_date, ttl):
+            meta = self.cache.meta(fred_id, frequency)
+            full = meta is None or start_date < meta['start_date']
+            try:
+                df = self._fetch(fred_id, start_date if full else meta['last_date'], None, frequency)
+            except requests.RequestException:
+                if full:
+                    raise
+            else:
+                self.cache.write(fred_id, frequency, start_date, df, replace=full)
+
+        return self.cache.read(fred_id, frequency, start_date, end_date).rename(columns={'value': data_id})
+
+    def get_many(self, data_ids: list, start_date: str, end_date: str=None, frequency: str=None,
+                 how: str='outer') -> pd.DataFrame:
+        '''
+        Fetches several series concurrently, at most max_workers at a time over one keep-alive session
+
+        Returns dataframe of a date column and one column per data_id, aligned on date
+        (how='outer' keeps every date with NaN where a series has no observation, 'inner' only shared dates)
+        '''
+        assert how in ('outer', 'inner'), "how must be 'outer' or 'inner'"
+        if not data_ids:
+            return pd.DataFrame({'date': pd.Series(dtype='datetime64[ns]')})
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(data_ids))) as pool:
+            dfs = list(pool.map(lambda data_id: self.get_fred_data(data_id, start_date, end_date, frequency), data_ids))
+        df = pd.concat([d.set_index('date') for d in dfs], axis=1, join=how).sort_index()
+        return df.reset_index()
+
+    def _fetch(self, fred_id: str, start_date: str, end_date: str=None, frequency: str=None) -> pd.DataFrame:
         params = {'series_id': fred_id,
                 'api_key': self.api_key, 
                 'file_type': self.file_type,
@@ -45,29 +138,16 @@ class FRED:
                 'aggregation_method': 'eop'
                 }
 
-        r = json.loads(requests.get(self.series_url, params=params).text)
-        data = {'date':[], data_id:[]}
-        f = lambda x: np.nan if i['value']=='.' else float(i['value'])
-        for i in r['observations']:
-            if i['value'] == '.':
-                continue
-            else:
-                data[data_id].append(f(i))
-                data['date'].append(pd.to_datetime(i['date']))        
-        
-        df = pd.DataFrame(data)
+        return parse_observations(self.transport.get(self.series_url, params)['observations'])
 
-        return df
-    
     def plot(self, df: pd.DataFrame, title: str, y_label: str):
+        import matplotlib.pyplot as plt
         fig, ax = plt.subplots()
         ax.plot(df['date'], df.iloc[:,1])
         last_date = df['date'].max()
         last_value = round(df.iloc[:,1].iloc[-1], 2)
         annotation_text = f"Date: {last_date.strftime('%Y-%m-%d')}\nValue: {last_value}%"
         
-        fig.canvas.draw()
-
         x_lim = ax.get_xlim()
         y_lim = ax.get_ylim()
 
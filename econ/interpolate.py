@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+
+def interpolate_series(df: pd.DataFrame, freq: str='MS', method: str='linear', start: str=None,
+                       end: str=None) -> pd.DataFrame:
+    '''
+    Resamples sparse points (e.g. yearly forecast medians) to a regular path at freq
+
+    Parameters
+    ----------
+    df : dataframe of a date column and one or more value columns
+    freq : pandas frequency of the path, e.g. 'MS' month starts, 'QS', 'W', 'D'
+    method : 'linear' interpolates on time between points, 'step' holds each point until the next one
+    start, end : range of the path, defaults to the first and last point
+
+    Returns dataframe of date and the value columns, dates outside the points hold the first/last value
+    '''
+    assert method in ('linear', 'step'), "method must be 'linear' or 'step'"
+    df = df.sort_values('date')
+    dates = pd.DatetimeIndex(pd.to_datetime(df['date']))
+    values = df.drop(columns='date')
+    target = pd.date_range(start or dates[0], end or dates[-1], freq=freq, name='date')
+
+    if method == 'linear':
+        x, xp = target.asi8.astype(float), dates.asi8.astype(float)
+        data = {c: np.interp(x, xp, values[c].to_numpy(dtype=float)) for c in values.columns}
+    else:
+        rows = np.clip(np.searchsorted(dates.asi8, target.asi8, 'right') - 1, 0, len(dates) - 1)
+        data = {c: values[c].to_numpy(dtype=float)[rows] for c in values.columns}
+
+    return pd.DataFrame({'date': target, **data})
@@ -0,0 +1,130 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+from .cache import default_cache_dir
+from utils.files import atomic_write
+
+
+def _ffill(values: np.ndarray) -> np.ndarray:
+    '''
+    Forward fills NaN down each column of a 2-D array, leading NaN stay NaN
+    '''
+    rows = np.where(np.isnan(values), 0, np.arange(len(values))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return values[rows, np.arange(values.shape[1])]
+
+
+class SeriesStore():
+    '''
+    Economic time series stored on one shared date index as contiguous float arrays
+
+    directory : folder of index.npy (sorted datetime64[D] dates) and one <series_id>.npy per series
+        of float64 values aligned to the index (NaN where the series has no observation),
+        defaults to the store folder of the FRED cache directory
+    frequency : FRED frequency the series were fetched at (e.g. 'm', 'w'), each frequency is kept in
+        its own subfolder of directory so a series at another frequency never overwrites it or
+        shares its date index. None for series at their native frequency
+
+    Series are memory-mapped on read so frame() slices rows instead of joining dataframes.
+    Adding dates not yet on the index rewrites every series, so writes are meant to be rare
+    compared to reads.
+    '''
+
+    _lock = threading.Lock()
+
+    def __init__(self, directory: str=None, frequency: str=None) -> None:
+        self.frequency = frequency
+        self.directory = os.path.join(directory or os.path.join(default_cache_dir(), 'store'), frequency or 'native')
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name + '.npy')
+
+    def _load(self, name: str) -> np.ndarray:
+        return np.load(self._path(name), mmap_mode='r')
+
+    def _save(self, name: str, values: np.ndarray) -> None:
+        atomic_write(self._path(name), lambda f: np.save(f, values))
+
+    @property
+    def index(self) -> np.ndarray:
+        if not os.path.exists(self._path('index')):
+            return np.array([], dtype='datetime64[D]')
+        return self._load('index')
+
+    @property
+    def series_ids(self) -> list:
+        return sorted(f[:-4] for f in os.listdir(self.directory) if f.endswith('.npy') and f != 'index.npy')
+
+    def put(self, series_id: str, df: pd.DataFrame) -> None:
+        '''
+        Adds or updates a series from a dataframe of a date column and a value column (e.g. from FRED.get_fred_data)
+
+        New dates overwrite existing values of series_id, other dates keep theirs.
+        '''
+        assert series_id != 'index', "series_id can't be 'index'"
+        dates = pd.to_datetime(df['date']).to_numpy().astype('datetime64[D]')
+        values = df.drop(columns='date').iloc[:, 0].to_numpy(dtype=float)
+
+        with self._lock:
+            index = np.asarray(self.index)
+            new_index = np.union1d(index, dates)
+            if len(new_index) != len(index):
+                positions = np.searchsorted(new_index, index)
+                for name in self.series_ids:
+                    column = np.full(len(new_index), np.nan)
+                    column[positions] = self._load(name)
+                    self._save(name, column)
+                self._save('index', new_index)
+
+            column = (np.array(self._load(series_id)) if series_id in self.series_ids
+                      else np.full(len(new_index), np.nan))
+            updated = column.copy()
+            updated[np.searchsorted(new_index, dates)] = values
+            if len(new_index) != len(index) or not np.array_equal(column, updated, equal_nan=True):
+                self._save(series_id, updated)
+
+    def put_frame(self, df: pd.DataFrame) -> None:
+        '''
+        Adds every column of a dataframe of a date column and one column per series (e.g. from FRED.get_many)
+        '''
+        for series_id in df.columns.drop('date'):
+            self.put(series_id, df[['date', series_id]].dropna())
+
+    def frame(self, series_ids: list, start: str=None, end: str=None, freq: str=None, how: str='inner') -> pd.DataFrame:
+        '''
+        Returns dataframe indexed by date with one column per series between start and end (inclusive)
+
+        freq : pandas period frequency (e.g. 'M', 'Q', 'W') to resample to, each period holds
+            the last value within it and is labelled by its start date, None keeps the stored dates
+        how : 'inner' keeps dates (periods) where every series has a value, 'ffill' carries the last
+            value of each series forward and keeps dates from when every series has started
+        '''
+        assert how in ('inner', 'ffill'), "how must be 'inner' or 'ffill'"
+        with self._lock:
+            index = self.index
+            lo = 0 if start is None else np.searchsorted(index, np.datetime64(pd.Timestamp(start).date()), 'left')
+            hi = len(index) if end is None else np.searchsorted(index, np.datetime64(pd.Timestamp(end).date()), 'right')
+            dates = pd.DatetimeIndex(np.asarray(index[lo:hi]), name='date')
+            values = np.column_stack([self._load(s)[lo:hi] for s in series_ids]) if len(series_ids) else \
+                np.empty((hi - lo, 0))
+
+        filled = _ffill(values) if len(values) else values
+        if freq is not None and len(dates):
+            periods = dates.to_period(freq)
+            codes = periods.asi8
+            starts = np.r_[0, np.flatnonzero(np.diff(codes)) + 1]
+            ends = np.r_[starts[1:], len(codes)] - 1
+            last = filled[ends]
+            if how == 'inner':
+                observed = np.add.reduceat(~np.isnan(values), starts, axis=0) > 0
+                last = np.where(observed, last, np.nan)
+            dates = periods[starts].to_timestamp().rename('date')
+            values = last
+        elif how == 'ffill':
+            values = filled
+
+        keep = ~np.isnan(values).any(axis=1)
+        return pd.DataFrame(values[keep], index=dates[keep], columns=list(series_ids))
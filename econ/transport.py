@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.files import atomic_write
+
+
+def fixture_key(url: str, params: dict) -> str:
+    '''
+    File name of a series' fixture, keyed by url, series_id and frequency only
+
+    The observation dates aren't part of the key since they depend on the day and on the
+    observation cache (incremental fetches start at the last cached date). Fixtures hold the
+    recorded observations and are sliced to the requested dates on replay.
+    '''
+    key = {k: str(params.get(k)) for k in ('series_id', 'frequency') if params.get(k) is not None}
+    data = json.dumps({'url': url, 'params': key}, sort_keys=True)
+    return '{}_{}.json'.format(key.get('series_id', 'request'), hashlib.sha256(data.encode()).hexdigest()[:16])
+
+
+def _in_range(date: str, start: str=None, end: str=None) -> bool:
+    return (start is None or date >= str(start)) and (end is None or date <= str(end))
+
+
+class HTTPTransport():
+    '''
+    Live requests over one keep-alive session
+
+    pool_size : connections kept open, should cover the number of concurrent requests
+    retries, backoff : retries of rate limited (429) and 5xx responses with exponential backoff
+        of backoff * 2**(retry - 1) seconds, Retry-After headers are respected
+    '''
+
+    def __init__(self, pool_size: int=4, retries: int=5, backoff: float=.5) -> None:
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=('GET',), respect_retry_after_header=True)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get(self, url: str, params: dict) -> dict:
+        response = self.session.get(url, params=params)
+        response.raise_for_status()
+        return response.json()
+
+
+class RecordingTransport():
+    '''
+    Passes requests to transport (HTTPTransport by default) and saves each response body
+    as a JSON fixture in directory for ReplayTransport
+
+    Observations of every request of a series are merged into its fixture (newer responses win
+    on the same date) and the earliest requested observation_start is kept as the recorded range.
+    '''
+
+    def __init__(self, directory: str, transport=None) -> None:
+        self.directory = directory
+        self.transport = transport or HTTPTransport()
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, url: str, params: dict) -> dict:
+        body = self.transport.get(url, params)
+        path = os.path.join(self.directory, fixture_key(url, params))
+        fixture = dict(body)
+        # None is the full history
+        start = params.get('observation_start')
+        start = None if start is None else str(start)
+        if os.path.exists(path):
+            with open(path) as f:
+                recorded = json.load(f)
+            observations = {o['date']: o for o in recorded.get('observations', [])}
+            observations.update({o['date']: o for o in body.get('observations', [])})
+            fixture['observations'] = [observations[d] for d in sorted(observations)]
+            prev_start = recorded.get('recorded_start')
+            start = None if start is None or prev_start is None else min(start, prev_start)
+        fixture['recorded_start'] = start
+        atomic_write(path, lambda f: json.dump(fixture, f), mode='w')
+        return body
+
+
+class ReplayTransport():
+    '''
+    Serves the fixtures saved by RecordingTransport without touching the network
+
+    Observations are sliced to the requested observation_start and observation_end, so replay
+    doesn't depend on the day or the observation cache state of the recording. Raises
+    FileNotFoundError for series that were never recorded or requests starting before the recorded range.
+    '''
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+
+    def get(self, url: str, params: dict) -> dict:
+        path = os.path.join(self.directory, fixture_key(url, params))
+        start, end = params.get('observation_start'), params.get('observation_end')
+        recorded = None
+        if os.path.exists(path):
+            with open(path) as f:
+                recorded = json.load(f)
+        if recorded is None or (start is not None and recorded.get('recorded_start') is not None
+                                and str(start) < recorded['recorded_start']):
+            raise FileNotFoundError('No recorded response for {} {}, record it with RecordingTransport'.format(
+                url, {k: v for k, v in params.items() if k != 'api_key'}))
+        body = {k: v for k, v in recorded.items() if k != 'recorded_start'}
+        body['observations'] = [o for o in recorded.get('observations', []) if _in_range(o['date'], start, end)]
+        return body
+
+
+def transport_from_env(pool_size: int=4, retries: int=5, backoff: float=.5):
+    '''
+    Transport selected by FRED_TRANSPORT (http, record or replay) with fixtures in FRED_FIXTURES_DIR
+    (defaults to econ/fixtures)
+    '''
+    mode = os.environ.get('FRED_TRANSPORT', 'http').lower()
+    assert mode in ('http', 'record', 'replay'), 'FRED_TRANSPORT must be http, record or replay'
+    if mode == 'http':
+        return HTTPTransport(pool_size, retries, backoff)
+    directory = os.environ.get('FRED_FIXTURES_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures'))
+    if mode == 'record':
+        return RecordingTransport(directory, HTTPTransport(pool_size, retries, backoff))
+    return ReplayTransport(directory)
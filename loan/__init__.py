@@ -1,3 +1,6 @@
 from .core import Loan
 from .loan_input import LoanInput
-
+from .batch import LoanBatch
+from .cache import LoanCache, loan_cache
+from .simulation import simulate_rent_vs_buy
+from .rollup import yearly_rollup
@@ -0,0 +1,195 @@
+import numpy as np
+import numpy_financial as npf
+from functools import cached_property
+from typing import List
+
+from .loan_input import LoanInput
+from utils.npf_amort import balance
+
+# cached schedule arrays shared with the one loan batches of row()
+SCHEDULE = ('mask', 'year', 'beg_bal', 'interest', 'principal', 'end_bal')
+
+class LoanBatch():
+    '''
+    Portfolio of loans amortized together on (n_loans, n_periods) arrays
+
+    Takes the same fields as LoanInput as columns (scalars are broadcast to every loan).
+    Loans with different terms share one period axis of length max(nper); periods past
+    a loan's own nper are padded with 0 and flagged False in mask.
+
+    Schedule arrays:
+        periods - payment number, shape (n_periods,)
+        mask - True where the period falls inside the loan's term
+        year - periods divided into years based on pmt_freq
+        beg_bal - beginning balance of loan in the period
+        principal - principal portion of mortgage payment
+        interest - interest portion of mortgage payment
+        end_bal - ending balance of loan in the period
+
+    Detail arrays (see detail, same columns as loan.core.Loan.amort_table_detail):
+        home_value, ltv_ratio, pmi, prop_tax, maint, closing_costs, cum_costs,
+        all_in_pmts, down_pmt, home_sale_cost, profit
+    '''
+
+    def __init__(self, asset_amt, rate_annual, num_years, pmt_freq=12, down_pmt=0, closing_cost=0,
+                 closing_cost_finance=False, prop_tax_rate=.01, pmi_rate=.01, maint_rate=.01,
+                 home_value_appreciation=.03, home_sale_percent=.06) -> None:
+
+        cols = np.broadcast_arrays(asset_amt, rate_annual, num_years, pmt_freq, down_pmt, closing_cost,
+                                   closing_cost_finance, prop_tax_rate, pmi_rate, maint_rate,
+                                   home_value_appreciation, home_sale_percent)
+        cols = [np.atleast_1d(c) for c in cols]
+        assert cols[0].ndim == 1, 'Batch inputs must be scalars or 1-D arrays'
+
+        self.asset_start_value = cols[0].astype(float)
+        self.rate_annual = cols[1].astype(float)
+        self.num_years = cols[2].astype(int)
+        self.pmt_freq = cols[3].astype(int)
+        self.down_pmt = cols[4].astype(float)
+        self.closing_cost = cols[5].astype(float)
+        self.closing_cost_finance = cols[6].astype(bool)
+        self.tax = cols[7].astype(float)
+        self.pmi = cols[8].astype(float)
+        self.maint = cols[9].astype(float)
+        self.appr_rate = cols[10].astype(float)
+        self.home_sale_percent = cols[11].astype(float)
+        assert (self.num_years >= 1).all() and (self.pmt_freq >= 1).all(), 'num_years and pmt_freq must be >= 1'
+
+        self.rate = self.rate_annual / self.pmt_freq
+        self.nper = self.num_years * self.pmt_freq
+        self.amt = self.asset_start_value*(1-self.down_pmt) + np.where(self.closing_cost_finance, self.closing_cost, 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.pmt = -npf.pmt(self.rate, self.nper, self.amt)
+        self.n_loans = self.amt.shape[0]
+        self.n_periods = int(self.nper.max())
+
+    @classmethod
+    def from_inputs(cls, loan_params: List[LoanInput]) -> 'LoanBatch':
+        '''
+        Builds a batch from validated LoanInput objects
+        '''
+        fields = list(LoanInput.model_fields)
+        cols = {f: np.array([getattr(p, f) for p in loan_params]) for f in fields}
+        return cls(**cols)
+
+    def take(self, indices) -> 'LoanBatch':
+        '''
+        Returns a new batch with only the loans at indices
+        '''
+        indices = np.atleast_1d(indices)
+        return LoanBatch(self.asset_start_value[indices], self.rate_annual[indices], self.num_years[indices],
+                         self.pmt_freq[indices], self.down_pmt[indices], self.closing_cost[indices],
+                         self.closing_cost_finance[indices], self.tax[indices], self.pmi[indices],
+                         self.maint[indices], self.appr_rate[indices], self.home_sale_percent[indices])
+
+    def row(self, index: int) -> 'LoanBatch':
+        '''
+        Returns a batch of the loan at index whose schedule arrays are views of this batch's,
+        so the schedule is computed once for the whole batch instead of per loan
+        '''
+        if self.n_loans == 1:
+            return self
+        row = self.take(index)
+        for name in SCHEDULE:
+            row.__dict__[name] = getattr(self, name)[index:index+1, :row.n_periods]
+        return row
+
+    def __len__(self) -> int:
+        return self.n_loans
+
+    def __getitem__(self, index: int):
+        '''
+        Returns a loan.core.Loan view onto one row of the batch
+        '''
+        from .core import Loan
+        if index < 0:
+            index += self.n_loans
+        if not 0 <= index < self.n_loans:
+            raise IndexError('LoanBatch index out of range')
+        return Loan.from_batch(self, index)
+
+    @cached_property
+    def periods(self) -> np.ndarray:
+        return np.arange(1, self.n_periods + 1)
+
+    @cached_property
+    def mask(self) -> np.ndarray:
+        return self.periods <= self.nper[:, None]
+
+    @cached_property
+    def year(self) -> np.ndarray:
+        year = (self.periods - 1) // self.pmt_freq[:, None] + 1
+        return np.where(self.mask, year, 0)
+
+    @cached_property
+    def beg_bal(self) -> np.ndarray:
+        beg_bal = balance(self.amt[:, None], self.rate[:, None], self.periods - 1, self.pmt[:, None])
+        return np.where(self.mask, beg_bal, 0)
+
+    @cached_property
+    def interest(self) -> np.ndarray:
+        return self.beg_bal * self.rate[:, None]
+
+    @cached_property
+    def principal(self) -> np.ndarray:
+        return np.where(self.mask, self.pmt[:, None] - self.interest, 0)
+
+    @cached_property
+    def end_bal(self) -> np.ndarray:
+        return self.beg_bal - self.principal
+
+    def yearly_min(self, values: np.ndarray) -> np.ndarray:
+        '''
+        Broadcasts the minimum of values within each loan year back onto every period of that year
+        '''
+        n = values.shape[-1]
+        freq = self.pmt_freq[0]
+        if (self.pmt_freq == freq).all() and n % freq == 0:
+            year_min = values.reshape(-1, n // freq, freq).min(axis=2)
+            return np.repeat(year_min, freq, axis=1).reshape(values.shape)
+        # mixed payment frequencies do not share a year grid, compare the first and last period
+        # of each year instead which is exact for the geometric home value paths used here
+        first = (np.maximum(self.year[:, :n], 1) - 1) * self.pmt_freq[:, None]
+        last = np.minimum(first + self.pmt_freq[:, None], np.minimum(self.nper, n)[:, None]) - 1
+        values = np.broadcast_to(values, (self.n_loans, n))
+        return np.minimum(np.take_along_axis(values, first, axis=1), np.take_along_axis(values, last, axis=1))
+
+    def detail(self, home_value: np.ndarray=None, stop: int=None) -> dict:
+        '''
+        Returns dict of detail column name to (n_loans, n_periods) array
+
+        home_value can be passed to override the compounding growth from appr_rate, e.g. with
+        simulated paths of shape (n_loans, n_periods) when the batch has a single pmt_freq,
+        or (n_paths, n_periods) for a batch of one loan
+
+        stop limits the arrays to the first stop periods when later periods aren't needed
+        '''
+        cols = slice(None, stop)
+        mask = self.mask[:, cols]
+        freq = self.pmt_freq[:, None]
+        first_period = self.periods[cols] == 1
+        down_pmt = self.asset_start_value * self.down_pmt
+
+        if home_value is None:
+            growth = np.broadcast_to(1 + self.appr_rate[:, None]/freq, mask.shape)
+            home_value = self.asset_start_value[:, None] * growth.cumprod(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ltv_ratio = self.end_bal[:, cols] / home_value
+        pmi = np.where(ltv_ratio > .8, (self.amt*.01)[:, None]/freq, 0)
+        year_value = self.yearly_min(home_value)
+        prop_tax = year_value*self.tax[:, None]/12
+        maint = year_value*self.maint[:, None]/12
+        closing_costs = np.where(first_period & ~self.closing_cost_finance[:, None], self.closing_cost[:, None], 0)
+
+        costs = np.where(mask, self.interest[:, cols] + pmi + prop_tax + maint + closing_costs, 0)
+        cum_costs = costs.cumsum(axis=1)
+        down_pmts = np.where(first_period, down_pmt[:, None], 0)
+        all_in_pmts = self.pmt[:, None] + pmi + prop_tax + maint + closing_costs + down_pmts
+        home_sale_cost = home_value * self.home_sale_percent[:, None]
+        profit = home_value - home_sale_cost - cum_costs - down_pmt[:, None] - self.amt[:, None]
+
+        detail = {'home_value': home_value, 'ltv_ratio': ltv_ratio, 'pmi': pmi, 'prop_tax': prop_tax,
+                  'maint': maint, 'closing_costs': closing_costs, 'cum_costs': cum_costs,
+                  'all_in_pmts': all_in_pmts, 'down_pmt': down_pmts, 'home_sale_cost': home_sale_cost,
+                  'profit': profit}
+        return {k: np.where(mask, v, 0) for k, v in detail.items()}
@@ -0,0 +1,49 @@
+import hashlib
+import json
+import pandas as pd
+
+from .core import Loan
+from .loan_input import LoanInput
+from utils.lru import LRUCache
+
+
+def loan_key(loan_params: LoanInput) -> str:
+    '''
+    Canonical hash of the LoanInput fields, equal inputs give equal keys
+
+    Numbers are hashed as floats since defaults (e.g. closing_cost=0) skip validation
+    '''
+    fields = {k: v if isinstance(v, bool) else float(v) for k, v in loan_params.model_dump().items()}
+    data = json.dumps(fields, sort_keys=True)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+class LoanCache(LRUCache):
+    '''
+    LRU cache of amortization results keyed by loan_key(LoanInput)
+
+    maxsize : max number of cached tables
+    max_bytes : optional max total memory of cached tables, least recently used are evicted first
+
+    Hits return a copy of the cached table so callers can't corrupt it.
+    '''
+
+    def __init__(self, maxsize: int=128, max_bytes: int=None) -> None:
+        super().__init__(maxsize, max_bytes)
+
+    def amort_table(self, loan_params: LoanInput) -> pd.DataFrame:
+        return self._get('amort_table', loan_params, lambda loan: loan.amort_table)
+
+    def amort_table_detail(self, loan_params: LoanInput) -> pd.DataFrame:
+        return self._get('amort_table_detail', loan_params, lambda loan: loan.amort_table_detail())
+
+    def _get(self, kind: str, loan_params: LoanInput, func) -> pd.DataFrame:
+        key = (kind, loan_key(loan_params))
+        df = self.get(key)
+        if df is None:
+            df = func(Loan(loan_params)).copy()
+            self.put(key, df, int(df.memory_usage(index=True).sum()))
+        return df.copy()
+
+
+loan_cache = LoanCache()
@@ -1,10 +1,13 @@
 #%%
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 
 from loan.core import Loan
+from loan.batch import LoanBatch
+from loan.cache import loan_cache
 from loan.loan_input import LoanInput
+from utils.compare import invest_difference, market_growth
+from utils.figure_cache import figure_cache
 
 class CompareDownPayments():
 
@@ -14,6 +17,7 @@ class CompareDownPayments():
 
         self.pmt_freq = loan.pmt_freq
         self.nper = loan.nper
+        self.sweep_results = None
 
     def get_compare_down_pmts_data(self) -> None:
         loans = {}
@@ -32,10 +36,42 @@ class CompareDownPayments():
                             'home_sale_percent': self.loan.home_sale_percent
                             }
             params = LoanInput(**loan_inputs)
-            loan_new = Loan(params)
-            df = loan_new.amort_table_detail().loc[:,['interest','all_in_pmts','profit']]
+            df = loan_cache.amort_table_detail(params).loc[:,['interest','all_in_pmts','profit']]
             loans[f'loan_{i}'] = (d, df)
         self.loans_dict = loans
+        self.sweep_results = None
+
+    def sweep_down_pmts(self, mkt_return: float=.10) -> dict:
+        '''
+        Vectorized alternative to get_compare_down_pmts_data + compare_down_pmts
+
+        Treats down payment as the first axis of a LoanBatch so every candidate is amortized
+        and compared in one pass. Results are (len(down_pmts), nper) arrays stored in
+        self.sweep_results:
+            down_pmt - down payment of each candidate
+            interest, all_in_pmts, profit - same as Loan.amort_table_detail
+            diff - difference to the highest all in payment, invested in the market
+            mkt_return - invested difference compounded by mkt_return
+            total_profit - profit + mkt_return
+        '''
+        loan = self.loan
+        down_pmts = np.asarray(self.down_pmts, dtype=float)
+        batch = LoanBatch(loan.asset_start_value, loan.rate_annual, loan.num_years, loan.pmt_freq, down_pmts,
+                          loan.closing_cost, loan.closing_cost_finance, loan.tax, loan.pmi, loan.maint,
+                          loan.appr_rate, loan.home_sale_percent)
+        detail = batch.detail()
+
+        result = invest_difference(detail['all_in_pmts'], market_growth(mkt_return, self.pmt_freq, self.nper),
+                                   base=detail['profit'])
+
+        self.sweep_results = {'down_pmt': down_pmts,
+                              'interest': batch.interest,
+                              'all_in_pmts': detail['all_in_pmts'],
+                              'profit': detail['profit'],
+                              'diff': result['diff'],
+                              'mkt_return': result['mkt_return'],
+                              'total_profit': result['return_total']}
+        return self.sweep_results
 
     @staticmethod
     def get_max_all_in_pmts(loans_dict: dict) -> pd.Series:
@@ -45,23 +81,36 @@ class CompareDownPayments():
         return df.max(axis=1)
 
     def compare_down_pmts(self, mkt_return: float=.10) -> None:
-        max_pmt = CompareDownPayments.get_max_all_in_pmts(self.loans_dict)
-        for k, v in self.loans_dict.items():
-            v[1]['max_pmt'] = max_pmt
-            v[1]['diff'] = v[1]['max_pmt'] - v[1]['all_in_pmts']
-            v[1]['diff'] = v[1]['diff'].apply(lambda x: x if x > 0 else 0)
-            v[1]['mkt_return'] = v[1]['diff'].cumsum() * np.array([1+(mkt_return/self.pmt_freq)]*self.nper).cumprod()
-            v[1]['total_profit'] = v[1]['profit'] + v[1]['mkt_return']
+        dfs = [v[1] for v in self.loans_dict.values()]
+        all_in_pmts = np.stack([df['all_in_pmts'].to_numpy() for df in dfs])
+        result = invest_difference(all_in_pmts, market_growth(mkt_return, self.pmt_freq, self.nper))
+        max_pmt = all_in_pmts.max(axis=0)
+        for i, df in enumerate(dfs):
+            df['max_pmt'] = max_pmt
+            df['diff'] = result['diff'][i]
+            df['mkt_return'] = result['mkt_return'][i]
+            df['total_profit'] = df['profit'] + df['mkt_return']
 
     def get_summary(self, years_compare=15) -> pd.DataFrame:
         self.years_compare = years_compare
+        if self.sweep_results is not None:
+            return pd.DataFrame({'down_pmt': [round(d, 2) for d in self.sweep_results['down_pmt']],
+                                 'total_profit': self.sweep_results['total_profit'][:, self.pmt_freq*years_compare-1]})
         results_dict = {'down_pmt':[], 'total_profit':[]}
         for k, v in self.loans_dict.items():
             results_dict['down_pmt'].append(round(v[0],2))
             results_dict['total_profit'].append(v[1]['total_profit'].iloc[self.pmt_freq*years_compare-1])
         return pd.DataFrame(results_dict)
     
-    def plot_summary(self, summary_results):
+    def render_summary(self, summary_results, years_compare: int=None, fmt: str='png') -> bytes:
+        '''
+        Image bytes of plot_summary, served from figure_cache while the summary is unchanged
+        '''
+        years_compare = years_compare or self.years_compare
+        return figure_cache.render(self.plot_summary, summary_results, years_compare, fmt=fmt)
+
+    def plot_summary(self, summary_results, years_compare: int=None):
+        import matplotlib.pyplot as plt
         fig, ax = plt.subplots()
         x = summary_results['down_pmt']
         y = summary_results['total_profit']
@@ -73,7 +122,7 @@ class CompareDownPayments():
         ax.set_xlim(xmin=x[0])
         ax.set_xlabel('Down Payment')
         ax.set_ylabel('Total Profit')
-        ax.set_title('Total Profit by Down Payment at Year {}'.format(self.years_compare))
+        ax.set_title('Total Profit by Down Payment at Year {}'.format(years_compare or self.years_compare))
         ax.grid(True)
 
         return fig
@@ -1,37 +1,110 @@
 import numpy as np
-import numpy_financial as npf
 import pandas as pd
-import matplotlib.pyplot as plt
 from typing import Tuple
 
 from .loan_input import LoanInput
-from utils.npf_amort import amort
+from .batch import LoanBatch
+from .rollup import yearly_rollup
+from utils.npf_amort import balance
+from utils.compare import invest_difference, market_growth, yearly_max
 
 
 class Loan():
     
     def __init__(self, loan_params: LoanInput) -> None:
+        self._bind(LoanBatch.from_inputs([loan_params]), 0)
 
-        self.asset_start_value = loan_params.asset_amt
-        self.rate_annual = loan_params.rate_annual
-        self.rate = loan_params.rate_annual / loan_params.pmt_freq
-        self.nper = loan_params.num_years * loan_params.pmt_freq
-        self.closing_cost = loan_params.closing_cost
-        self.closing_cost_finance = loan_params.closing_cost_finance
-        self.down_pmt = loan_params.down_pmt
-        self.home_sale_percent = loan_params.home_sale_percent
-        if loan_params.closing_cost_finance:
-            self.amt = (self.asset_start_value*(1-self.down_pmt)) + self.closing_cost
-        else:
-            self.amt = (self.asset_start_value*(1-self.down_pmt))
-        self.pmt = -npf.pmt(self.rate, self.nper, self.amt)
-        self.num_years = loan_params.num_years
-        self.pmt_freq = loan_params.pmt_freq
-        self.tax = loan_params.prop_tax_rate
-        self.pmi = loan_params.pmi_rate
-        self.maint = loan_params.maint_rate
-        self.appr_rate = loan_params.home_value_appreciation
-        self.amort_table = amort(self.amt, self.nper, self.pmt, self.pmt_freq, self.rate)
+    @classmethod
+    def from_batch(cls, batch: LoanBatch, index: int) -> 'Loan':
+        '''
+        Returns a Loan that is a view onto row index of a LoanBatch
+        '''
+        loan = cls.__new__(cls)
+        loan._bind(batch, index)
+        return loan
+
+    def _bind(self, batch: LoanBatch, index: int) -> None:
+        self.batch = batch
+        self.index = index
+
+        self.asset_start_value = batch.asset_start_value[index].item()
+        self.rate_annual = batch.rate_annual[index].item()
+        self.rate = batch.rate[index].item()
+        self.nper = batch.nper[index].item()
+        self.closing_cost = batch.closing_cost[index].item()
+        self.closing_cost_finance = batch.closing_cost_finance[index].item()
+        self.down_pmt = batch.down_pmt[index].item()
+        self.home_sale_percent = batch.home_sale_percent[index].item()
+        self.amt = batch.amt[index].item()
+        self.pmt = batch.pmt[index].item()
+        self.num_years = batch.num_years[index].item()
+        self.pmt_freq = batch.pmt_freq[index].item()
+        self.tax = batch.tax[index].item()
+        self.pmi = batch.pmi[index].item()
+        self.maint = batch.maint[index].item()
+        self.appr_rate = batch.appr_rate[index].item()
+        self._amort_table = None
+        self._row = None
+
+    def _batch_row(self) -> LoanBatch:
+        '''
+        Batch holding only this loan, sharing the schedule arrays of the batch it is bound to
+        '''
+        if self._row is None:
+            self._row = self.batch.row(self.index)
+        return self._row
+
+    @property
+    def amort_table(self) -> pd.DataFrame:
+        '''
+        Full amortization table, built on first access
+        '''
+        if self._amort_table is None:
+            self._amort_table = self.schedule(0, self.nper)
+        return self._amort_table
+
+    def schedule(self, start: int=0, stop: int=None) -> pd.DataFrame:
+        '''
+        Returns rows start:stop of the amortization table (same as amort_table.iloc[start:stop])
+        without building the full table
+        '''
+        start, stop, _ = slice(start, stop).indices(self.nper)
+        if self._amort_table is not None:
+            return self._amort_table.iloc[start:stop].copy()
+
+        periods = np.arange(start + 1, stop + 1)
+        beg_bal = balance(self.amt, self.rate, periods - 1, self.pmt)
+        interest = beg_bal * self.rate
+        principal = self.pmt - interest
+
+        df = pd.DataFrame(index=pd.RangeIndex(start, stop))
+        df['period'] = periods
+        df['year'] = (periods - 1) // self.pmt_freq + 1
+        df['beg_bal'] = beg_bal
+        df['pmt'] = self.pmt
+        df['principal'] = principal
+        df['interest'] = interest
+        df['end_bal'] = beg_bal - principal
+        return df
+
+    def balance_at(self, period):
+        '''
+        Loan balance after period payments (period 0 is the loan amount)
+        '''
+        bal = balance(self.amt, self.rate, np.asarray(period), self.pmt)
+        return bal.item() if bal.ndim == 0 else bal
+
+    def cumulative_principal(self, period):
+        '''
+        Total principal paid over the first period payments
+        '''
+        return self.amt - self.balance_at(period)
+
+    def cumulative_interest(self, period):
+        '''
+        Total interest paid over the first period payments
+        '''
+        return np.asarray(period)*self.pmt - self.cumulative_principal(period)
 
     def amort_table_detail(self) -> pd.DataFrame:
         '''
@@ -58,78 +131,48 @@ class Loan():
             profit - home value at each period less home_sale_cost, cum_costs, down_pmt, end_bal (remaining loan balance)      
         '''
 
-        df = self.amort_table
-        df['home_value'] = self.asset_start_value * np.array([1+(self.appr_rate/self.pmt_freq)]*self.nper).cumprod()
-        df['ltv_ratio'] = df['end_bal'] / df['home_value']
-        df['pmi'] =  df['ltv_ratio'].apply(lambda x: self.amt*.01/self.pmt_freq if x > .8 else 0)
-        
-        df_tax_maint = df[['year', 'home_value']].groupby('year').min()
-        #df_tax_maint = df_tax_maint.rename(columns={'home_value':'prop_tax'})
-        df_tax_maint['prop_tax'] = df_tax_maint['home_value']*self.tax/12
-        df_tax_maint['maint'] = df_tax_maint['home_value']*self.maint/12
-        df = df.merge(df_tax_maint[['prop_tax', 'maint']], how='left', left_on='year', right_index=True)
-
-        if not self.closing_cost_finance:
-            closing_costs = np.array([0]*self.nper)
-            closing_costs[0] = self.closing_cost
-            df['closing_costs'] = closing_costs
-        else:
-            df['closing_costs'] = 0
-        
-        costs = df['interest'] + df['pmi'] + df['prop_tax'] + df['maint'] + df['closing_costs']
-        df['cum_costs'] = costs.cumsum()
-
-        df['all_in_pmts'] = df[['pmt', 'pmi', 'prop_tax', 'maint', 'closing_costs']].sum(axis=1)
-        d_pmt = np.array([0]*self.nper)
-        d_pmt[0] = (self.asset_start_value * self.down_pmt)
-        df['down_pmt'] = d_pmt
-        df['all_in_pmts'] = df['all_in_pmts'] + df['down_pmt']
-
-        df['home_sale_cost'] = df['home_value'] * self.home_sale_percent
-        df['profit'] = df['home_value'] - df['home_sale_cost'] - df['cum_costs'] - self.asset_start_value*self.down_pmt - self.amt
+        detail = self._batch_row().detail()
+
+        data = {col: self.amort_table[col].to_numpy() for col in self.amort_table.columns}
+        data.update((col, values[0, :self.nper]) for col, values in detail.items())
+        df = pd.DataFrame(data)
 
         return df
+
+    def yearly_rollup(self, num_years: int=None) -> pd.DataFrame:
+        '''
+        Sum, min, max and last value within each year of every amort_table_detail column, see loan.rollup.yearly_rollup
+        '''
+        return yearly_rollup(self.amort_table_detail(), self.pmt_freq, num_years)
     
     def rent_vs_buy(self, rent: int, rent_increase: float, mkt_return: float=.10,
-                    cap_gains_tax: float=.15, num_years_analysis: int=10) -> pd.DataFrame:
-
-        df = self.amort_table_detail()
-
-        df_rent = pd.DataFrame(data=((1+rent_increase)**(df['year'] - 1)) * rent).rename(columns={'year':'rent'})
-        df_rent['year'] = df['year']
-
-        df['diff'] = df_rent['rent'] - df['all_in_pmts']
-        df['diff'] = df['diff'].apply(lambda x: x if x > 0 else 0)
-
-        df_rent['diff'] = df['all_in_pmts'] - df_rent['rent']
-        df_rent['diff'] = df_rent['diff'].apply(lambda x: x if x > 0 else 0)
-
-        df['mkt_return'] = df['diff'].cumsum() * np.array([1+(mkt_return/self.pmt_freq)]*self.nper).cumprod()
-        df['diff_cumulative'] = df['diff'].cumsum()
-        df['cap_gains_cumulative'] = df['mkt_return'] - df['diff_cumulative']
-        df['cap_gains_tax'] = df['cap_gains_cumulative'] * cap_gains_tax
-        df['mkt_return_net'] = df['mkt_return'] - df['cap_gains_tax']
-        df['return_total'] = df['mkt_return_net'] + df['profit']
-
-        df_rent['mkt_return'] = df_rent['diff'].cumsum() * np.array([1+(mkt_return/self.pmt_freq)]*self.nper).cumprod()
-        df_rent['diff_cumulative'] = df_rent['diff'].cumsum()
-        df_rent['cap_gains_cumulative'] = df_rent['mkt_return'] - df_rent['diff_cumulative']
-        df_rent['cap_gains_tax'] = df_rent['cap_gains_cumulative'] * cap_gains_tax
-        df_rent['mkt_return_net'] = df_rent['mkt_return'] - df_rent['cap_gains_tax']
-        df_rent['rent_cumulative'] = df_rent['rent'].cumsum()
-        df_rent['return_total'] = df_rent['mkt_return_net'] - df_rent['rent_cumulative']
-
-        cols_df = ['year', 'profit', 'diff_cumulative', 'mkt_return_net', 'return_total']
-        cols_rent = ['year', 'rent', 'rent_cumulative', 'diff_cumulative', 'mkt_return_net', 'return_total']
-
-        df_year = df.loc[:, cols_df].groupby('year').max().reset_index()
-        df_rent_year = df_rent.loc[:, cols_rent].groupby('year').max().reset_index()
-        df_year = df_year[df_year['year']<=num_years_analysis]
-        df_rent_year = df_rent_year[df_rent_year['year']<=num_years_analysis]
-        
-        return (df_year, df_rent_year)
-
-
-
+                    cap_gains_tax: float=.15, num_years_analysis: int=10) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        '''
+        Compares home ownership to renting, whichever is cheaper each period invests the difference
 
+        Returns yearly (max within each year) home owner and renter dataframes up to num_years_analysis
+        '''
+        years = min(num_years_analysis, self.num_years)
+        nper = years * self.pmt_freq
+        batch = self._batch_row()
+        detail = batch.detail(stop=nper)
+        profit = detail['profit'][0]
+
+        rent_pmts = ((1+rent_increase)**(batch.year[0, :nper] - 1)) * rent
+        rent_cumulative = rent_pmts.cumsum()
+        result = invest_difference(np.stack([detail['all_in_pmts'][0], rent_pmts]),
+                                   market_growth(mkt_return, self.pmt_freq, nper), cap_gains_tax,
+                                   base=np.stack([profit, -rent_cumulative]))
+
+        def yearly(cols):
+            data = {'year': np.arange(1, years + 1)}
+            data.update((k, yearly_max(v, self.pmt_freq)) for k, v in cols.items())
+            return pd.DataFrame(data)
+
+        df_year = yearly({'profit': profit, 'diff_cumulative': result['diff_cumulative'][0],
+                          'mkt_return_net': result['mkt_return_net'][0], 'return_total': result['return_total'][0]})
+        df_rent_year = yearly({'rent': rent_pmts, 'rent_cumulative': rent_cumulative,
+                               'diff_cumulative': result['diff_cumulative'][1],
+                               'mkt_return_net': result['mkt_return_net'][1], 'return_total': result['return_total'][1]})
 
+        return (df_year, df_rent_year)
@@ -6,90 +6,114 @@ import matplotlib.pyplot as plt
 
 from loan.core import Loan
 from loan.loan_input import LoanInput
+from utils.figure_cache import figure_cache
 
 class LoanPlots:
+    '''
+    Charts of a loan's yearly rollup
 
-    def __init__(self, loan: Loan, num_years: int):
+    backend : 'matplotlib' methods return figures, 'altair' methods return Altair charts
+        (rendered in the browser from a Vega-Lite spec, e.g. with st.altair_chart)
+    '''
+
+    def __init__(self, loan: Loan, num_years: int, backend: str='matplotlib'):
+        assert backend in ('matplotlib', 'altair'), "backend must be 'matplotlib' or 'altair'"
         self.loan = loan
         self.num_years = num_years
-        self.df = loan.amort_table_detail()
-        self.df = self.df[self.df['year']<=num_years]
-        min_x = self.df['year'].min()
-        max_x = self.df['year'].max()
-        self.domain = [min_x, max_x]
-    
-    @staticmethod
-    def get_bar_values(patches):
-        bar_dict = {}
-        bar_map = {}
-        i = 0
-        for a in patches: 
-            if a.get_x() not in bar_dict.keys():
-                bar_dict[a.get_x()] = []
-                if a.get_height() > 0:
-                    bar_dict[a.get_x()].append({'get_x':a.get_x(), 'get_width':a.get_width(),
-                                                'get_height': a.get_height(), 'get_y': a.get_y()})
-                bar_map[a.get_x()] = i
-                i += 1
-            else:
-                if a.get_height() > 0:
-                    bar_dict[a.get_x()].append({'get_x':a.get_x(), 'get_width':a.get_width(),
-                                                'get_height': a.get_height(), 'get_y': a.get_y()})
-        bar_dict = dict((bar_map[key], value) for (key, value) in bar_dict.items())
-        return bar_dict
-    
+        self.backend = backend
+        self.rollup = loan.yearly_rollup(num_years)
+        self.domain = [self.rollup.index.min(), self.rollup.index.max()]
+
+    def render(self, chart: str, *args, fmt: str='png', **kwargs) -> bytes:
+        '''
+        Image bytes of a chart method (e.g. 'payment'), served from figure_cache while its inputs are unchanged
+        '''
+        assert self.backend == 'matplotlib', 'render is for the matplotlib backend, altair charts render in the browser'
+        loan = self.loan
+        data = (self.rollup, self.num_years, loan.asset_start_value, loan.amt, loan.down_pmt, loan.pmt_freq)
+        return figure_cache.render(getattr(self, chart), *args, data=data, fmt=fmt, **kwargs)
+
+    def payment_data(self) -> pd.DataFrame:
+        '''
+        Max payment components within each year, indexed by year
+        '''
+        cols = ['principal', 'interest', 'pmi', 'prop_tax', 'maint']
+        return self.rollup.xs('max', axis=1, level=1)[cols]
+
+    def home_value_data(self) -> pd.DataFrame:
+        df_value = self.rollup['home_value'][['max']].rename(columns={'max': 'home_value'}).reset_index()
+        asset_start = pd.DataFrame({'year':0, 'home_value':self.loan.asset_start_value}, index=[0])
+        return pd.concat([asset_start, df_value]).reset_index(drop = True)
+
+    def waterfall_data(self) -> pd.DataFrame:
+        '''
+        Profit components at num_years with the bottom of each waterfall bar
+        '''
+        totals = self.rollup.xs('sum', axis=1, level=1).sum()
+        last = self.rollup.xs('last', axis=1, level=1).iloc[-1]
+        data = {}
+        data['Home Appr'] = last['home_value'] - self.loan.amt - self.loan.asset_start_value*self.loan.down_pmt
+        data['Interest'] = -totals['interest']
+        data['PMI'] = -totals['pmi']
+        data['Maint'] = -totals['maint']
+        data['Prop Tax'] = -totals['prop_tax']
+        data['Broker Fees'] = -last['home_sale_cost'] - totals['closing_costs']
+        data = pd.DataFrame(data, index=[0])
+        data['Profit'] = data.sum(axis=1)
+        data = data.transpose().reset_index().rename(columns={'index':'type', 0:'value'})
+        data = data[data['value'] != 0].reset_index(drop=True)
+
+        is_profit = (data['type'] == 'Profit').to_numpy()
+        bottom = np.r_[0, data['value'].cumsum().to_numpy()[:-1]]
+        data['bottom'] = np.where(is_profit, 0, bottom)
+        data['color'] = np.where(is_profit, 'black', np.where(data['value'] < 0, 'red', 'green'))
+        return data
+
     def payment(self, datalabels=3):
-        df_pmt = self.df[['year', 'principal', 'interest', 'pmi', 'prop_tax', 'maint']]
-        data = df_pmt.groupby('year').max().reset_index()
-        totals = data.sum(axis=1)
-        data = data.to_dict('Series')
-        y = data['year']
-        del data['year']
-        bottom = np.zeros(len(y))
+        if self.backend == 'altair':
+            return self._payment_altair(datalabels)
+        data = self.payment_data()
+        years = data.index.to_numpy()
+        values = data.to_numpy()
+        tops = values.cumsum(axis=1)
+        totals = tops[:, -1]
+
         fig, ax = plt.subplots()
-        for k, v in data.items():
-            ax.bar(y, v, label=k, bottom=bottom)
-            bottom += v
+        for j, k in enumerate(data.columns):
+            ax.bar(years, values[:, j], label=k, bottom=tops[:, j] - values[:, j])
         ax.legend(loc='upper center', bbox_to_anchor=(0.5, -0.1),
           fancybox=True, shadow=True, ncol=5)
         ax.set_xlabel('Year')
         ax.set_ylabel('Payment')
-        ax.set_title('Monthly Total Payments by Year')  
+        ax.set_title('Monthly Total Payments by Year')
         ax.set_ylim(ymin=0, ymax=totals.max()*1.1)
-        ax.set_xlim(xmin=.5, xmax=df_pmt['year'].max()+.5)  
-        
-        # total data labels
+        ax.set_xlim(xmin=.5, xmax=years.max()+.5)
+
+        # total and stacked bar data labels of every datalabels year, positioned from the stacked data
         y_offset = 50
-        for i, total in enumerate(totals):
-            if i % datalabels == 0:
-                ax.text(totals.index[i]+1, total + y_offset,
-                        str(round(total/1000,1))+'K',
-                        ha='center',
-                        size=8
-                )
-        
-        # stacked bar data labels
-        bar_dict = LoanPlots.get_bar_values(ax.patches)
-        for i in bar_dict:
-            if i % datalabels == 0:
-                for v in bar_dict[i]:
-                    ax.text(
-                        v['get_x'] + v['get_width'] / 2,
-                        v['get_height']/2 + v['get_y'],
-                        round(v['get_height']),
-                        ha='center',
-                        color='black',
-                        size=6
-                    )
+        labeled = np.arange(len(years)) % datalabels == 0
+        for year, total in zip(years[labeled], totals[labeled]):
+            ax.text(year, total + y_offset, str(round(total/1000,1))+'K', ha='center', size=8)
+        rows, cols = np.nonzero(labeled[:, None] & (values > 0))
+        for year, center, v in zip(years[rows], tops[rows, cols] - values[rows, cols]/2, values[rows, cols]):
+            ax.text(year, center, round(v), ha='center', color='black', size=6)
+
         ax.get_yaxis().set_visible(False)
         ax.spines['top'].set_visible(False)
         ax.spines['right'].set_visible(False)
         ax.spines['bottom'].set_visible(False)
         ax.spines['left'].set_visible(False)
         return fig
-    
+
     def profit(self):
-        df_profit = self.df[['year', 'profit']].groupby('year').max().reset_index()
+        df_profit = self.rollup['profit'][['max']].rename(columns={'max': 'profit'}).reset_index()
+        if self.backend == 'altair':
+            line = alt.Chart(df_profit, title='Profit by Year').mark_line().encode(
+                x=alt.X('year:Q', title='Year'), y=alt.Y('profit:Q', title='Profit', axis=alt.Axis(format='$,.0f')),
+                tooltip=['year', alt.Tooltip('profit:Q', format='$,.0f')])
+            if df_profit['profit'].min() < 0:
+                line = line + alt.Chart(pd.DataFrame({'profit': [0]})).mark_rule(color='red').encode(y='profit:Q')
+            return line
         fig, ax = plt.subplots()
         ax.plot(df_profit.loc[:,'year'], df_profit.loc[:,'profit'])
         if df_profit.loc[:,'profit'].min() < 0:
@@ -99,27 +123,27 @@ class LoanPlots:
         ax.set_title('Profit by Year')
         ax.grid(True)
         return fig
-    
+
     def home_value(self, cagr):
-        df_value = self.df[['year', 'home_value']].groupby('year').max().reset_index()
-        asset_start = pd.DataFrame({'year':0, 'home_value':self.loan.asset_start_value}, index=[0])
-        df_value = pd.concat([asset_start, df_value]).reset_index(drop = True)
+        df_value = self.home_value_data()
+        if self.backend == 'altair':
+            return self._home_value_altair(df_value, cagr)
         fig, ax = plt.subplots()
         ax.bar(df_value['year'], df_value['home_value'])
 
-        y_offset = 5000
-        for i, v in enumerate(df_value['home_value']):
-            if i == 0 or i == df_value.shape[0]-1:
-                ax.text(df_value.index[i], v*1.06,
-                        str(round(v/1000,1))+'K',
-                        ha='center',
-                        size=10,
-                        weight='bold'
-                )
+        for i in (0, len(df_value)-1):
+            v = df_value['home_value'].iloc[i]
+            ax.text(df_value['year'].iloc[i], v*1.06,
+                    str(round(v/1000,1))+'K',
+                    ha='center',
+                    size=10,
+                    weight='bold'
+            )
 
-        mid_patch = round(len(ax.patches)/3) 
-        x = list(ax.patches)[mid_patch].get_x()
-        y = list(ax.patches)[mid_patch].get_height()*1.2
+        # left edge of the bar a third of the way along (default bar width .8)
+        mid = round(len(df_value)/3)
+        x = df_value['year'].iloc[mid] - .4
+        y = df_value['home_value'].iloc[mid]*1.2
 
         ax.text(x, y, '{}% CAGR'.format(round(cagr*100,1)), color='r', weight='bold', fontsize=10)
 
@@ -130,47 +154,20 @@ class LoanPlots:
         ax.set_title('Home Value by Year')
         ax.set_ylim(ymin=0, ymax=df_value['home_value'].max()*1.12)
         return fig
-    
+
     def profit_waterfall(self):
-        num_id = self.num_years*self.loan.pmt_freq-1
-        data = {}
-        data['Home Appr'] = self.df.loc[num_id, 'home_value'] - self.loan.amt - self.loan.asset_start_value*self.loan.down_pmt
-        data['Interest'] = -self.df.loc[:num_id, 'interest'].sum()
-        data['PMI'] = -self.df.loc[:num_id, 'pmi'].sum()
-        data['Maint'] = -self.df.loc[:num_id, 'maint'].sum()
-        data['Prop Tax'] = -self.df.loc[:num_id, 'prop_tax'].sum()
-        data['Broker Fees'] = -self.df.loc[num_id,'home_sale_cost'] - self.df.loc[0,'closing_costs']
-        data = pd.DataFrame(data, index=[0])
-        data['Profit'] = data.sum(axis=1)
-        data = data.transpose().reset_index().rename(columns={'index':'type', 0:'value'})
-        data = data[data['value'] != 0]
+        data = self.waterfall_data()
+        if self.backend == 'altair':
+            return self._waterfall_altair(data)
 
         fig, ax = plt.subplots()
-
-        bottom = 0
-        for i, t in enumerate(data['type']):
-            val = data[data['type']==t].loc[:,'value'].values[0]
-            if t == 'Profit':
-                ax.bar(t, val, color='black')
-            elif val < 0:
-                ax.bar(t, val, color='red', bottom=bottom)
-            else:
-                ax.bar(t, val, color='green', bottom=bottom)
-            bottom += val
+        ax.bar(data['type'], data['value'], bottom=data['bottom'], color=data['color'])
 
         for tick in ax.get_xticklabels():
             tick.set_rotation(45)
 
-        for a in ax.patches:
-            ax.text(
-                a.get_x() + a.get_width() / 2,
-                a.get_height() / 2 + a.get_y(),
-                str(round(a.get_height()/1000, 1)) + 'K',
-                ha='center',
-                color='white',
-                size=9,
-                weight='bold' 
-            )
+        for i, (v, b) in enumerate(zip(data['value'], data['bottom'])):
+            ax.text(i, b + v/2, str(round(v/1000, 1)) + 'K', ha='center', color='white', size=9, weight='bold')
         ax.set_ylim(ymax=data['value'].max()*1.1)
         ax.set_facecolor('tan')
         ax.set_title('Profit Waterfall at Year {}'.format(self.num_years))
@@ -182,5 +179,41 @@ class LoanPlots:
 
         return fig
 
+    def _payment_altair(self, datalabels):
+        data = self.payment_data()
+        df = data.reset_index().melt('year', var_name='component', value_name='payment')
+        totals = data.sum(axis=1).rename('total').reset_index()
+        totals = totals[np.arange(len(totals)) % datalabels == 0]
+        totals['label'] = (totals['total']/1000).round(1).astype(str) + 'K'
+
+        bars = alt.Chart(df, title='Monthly Total Payments by Year').mark_bar().encode(
+            x=alt.X('year:O', title='Year'), y=alt.Y('sum(payment):Q', title='Payment'),
+            color=alt.Color('component:N', sort=list(data.columns), legend=alt.Legend(orient='bottom')),
+            order=alt.Order('component_order:Q'),
+            tooltip=['year', 'component', alt.Tooltip('payment:Q', format='$,.0f')]
+        ).transform_calculate(component_order='indexof({}, datum.component)'.format(list(data.columns)))
+        labels = alt.Chart(totals).mark_text(dy=-6, size=8).encode(x='year:O', y='total:Q', text='label:N')
+        return bars + labels
+
+    def _home_value_altair(self, df_value, cagr):
+        ends = df_value.iloc[[0, -1]].assign(label=lambda d: (d['home_value']/1000).round(1).astype(str) + 'K')
+        title = 'Home Value by Year ({}% CAGR)'.format(round(cagr*100,1))
+        bars = alt.Chart(df_value, title=title).mark_bar().encode(
+            x=alt.X('year:O', title='Year'), y=alt.Y('home_value:Q', title='Home Value', axis=alt.Axis(format='$,.0f')),
+            tooltip=['year', alt.Tooltip('home_value:Q', format='$,.0f')])
+        labels = alt.Chart(ends).mark_text(dy=-8, fontWeight='bold').encode(x='year:O', y='home_value:Q', text='label:N')
+        return bars + labels
 
-#%%
\ No newline at end of file
+    def _waterfall_altair(self, data):
+        data = data.assign(top=data['bottom'] + data['value'], center=data['bottom'] + data['value']/2,
+                           label=(data['value']/1000).round(1).astype(str) + 'K')
+        base = alt.Chart(data, title='Profit Waterfall at Year {}'.format(self.num_years)).encode(
+            x=alt.X('type:N', sort=list(data['type']), title=None))
+        bars = base.mark_bar().encode(y=alt.Y('bottom:Q', axis=None), y2='top:Q',
+                                      color=alt.Color('color:N', scale=None),
+                                      tooltip=['type', alt.Tooltip('value:Q', format='$,.0f')])
+        labels = base.mark_text(color='white', fontWeight='bold').encode(y='center:Q', text='label:N')
+        return bars + labels
+
+
+#%%
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+STATS = ('sum', 'min', 'max', 'last')
+
+
+def yearly_rollup(df: pd.DataFrame, pmt_freq: int, num_years: int=None) -> pd.DataFrame:
+    '''
+    Sum, min, max and last value within each year of every column of an amortization table
+
+    The periods of whole years are reshaped to a (n_years, pmt_freq, n_columns) grid and
+    reduced along the period axis, so every column and statistic comes from one pass.
+
+    Parameters
+    ----------
+    df : amort_table or amort_table_detail with a year column, one row per period from period 1
+    pmt_freq : payments per year
+    num_years : optional number of years to keep, defaults to every whole year of df
+
+    Returns dataframe indexed by year with (column, stat) MultiIndex columns, e.g. rollup['pmi', 'sum']
+    '''
+    n_years = len(df) // pmt_freq if num_years is None else min(num_years, len(df) // pmt_freq)
+    columns = [c for c in df.columns if c != 'year']
+    grid = df[columns].to_numpy(dtype=float)[:n_years*pmt_freq].reshape(n_years, pmt_freq, len(columns))
+
+    stats = {'sum': grid.sum(axis=1), 'min': grid.min(axis=1), 'max': grid.max(axis=1), 'last': grid[:, -1]}
+    values = np.stack([stats[s] for s in STATS], axis=2).reshape(n_years, -1)
+    return pd.DataFrame(values, index=pd.Index(np.arange(1, n_years + 1), name='year'),
+                        columns=pd.MultiIndex.from_product([columns, STATS]))
@@ -0,0 +1,127 @@
+'''
+Cached compute layer for the Streamlit pages
+
+Functions take plain, hashable arguments (loan inputs as a dict, lists as tuples) so results are
+shared across pages and sessions. DataFrames and arrays are cached with st.cache_data (each caller
+gets a copy), objects that are only read after construction (Loan, LoanPlots) or hold connections
+(FRED) with st.cache_resource and are shared. Objects with per call state (CompareDownPayments)
+are built per call from cached data.
+'''
+import pandas as pd
+import streamlit as st
+from typing import Tuple
+
+from .loan_input import LoanInput
+from .core import Loan
+from .compare_down_pmts import CompareDownPayments
+from .plots import LoanPlots
+
+# loan results only depend on their inputs, TTLs bound memory of rarely used inputs
+LOAN_TTL = 6*3600
+LOAN_MAX_ENTRIES = 256
+# FRED frames are also cached on disk by FRED, this saves the disk reads and alignment
+FRED_TTL = 3600
+FRED_MAX_ENTRIES = 32
+
+
+def loan_sidebar(extra_inputs=None) -> Tuple[dict, int, dict]:
+    '''
+    Renders the loan input sidebar shared by the loan pages
+
+    extra_inputs : optional function rendering page specific widgets after Years to Analyze,
+        returning a dict of their values
+
+    Returns loan inputs dict (validated by LoanInput), years to analyze and the extra inputs
+    '''
+    with st.sidebar:
+        st.header("Input Parameters")
+        num_years_analysis = st.number_input("Years to Analyze", min_value=1, max_value=30, value=15, step=1)
+        extras = extra_inputs() if extra_inputs else {}
+
+        asset_amt = st.number_input("Asset Value", min_value=0, value=300000, step=25000)
+        down_pmt = st.number_input("Down Payment %", min_value=0.0, max_value=1.0, value=.2, format='%f')
+        rate_annual = st.number_input("Annual Interest Rate", min_value=0.0, max_value=1.0, value=.05, step=.005, format='%f')
+        home_value_appreciation = st.number_input("Annual Asset Appreciation", min_value=0.0, max_value=1.0, value=.05, step=.005, format='%f')
+        num_years = st.number_input("Number of Year", min_value=1, value=30)
+        pmt_freq = st.number_input("Payment Frequency", min_value=1, value=12)
+        closing_cost = st.number_input("Closing Cost", min_value=0, value=0)
+        closing_cost_finance = st.checkbox("Finance Closing Cost", value=False)
+        prop_tax_rate = st.number_input("Property Tax Rate", min_value=0.0, max_value=1.0, value=.01, step=.005, format='%f')
+        pmi_rate = st.number_input("PMI Rate", min_value=0.0, max_value=1.0, value=.01, step=.005, format='%f')
+        maint_rate = st.number_input("Maintenance", min_value=0.0, max_value=1.0, value=.01, step=.005, format='%f')
+        home_sale_percent = st.number_input("Asset Sale % Cost", min_value=0.0, max_value=1.0, value=.06, step=.005, format='%f')
+
+    loan_inputs = {'asset_amt':asset_amt, 'rate_annual': rate_annual, 'num_years': num_years, 'pmt_freq': pmt_freq,
+                   'down_pmt': down_pmt, 'closing_cost': closing_cost, 'closing_cost_finance': closing_cost_finance,
+                   'prop_tax_rate': prop_tax_rate, 'pmi_rate': pmi_rate, 'maint_rate': maint_rate,
+                   'home_value_appreciation': home_value_appreciation, 'home_sale_percent': home_sale_percent}
+    return LoanInput(**loan_inputs).model_dump(), num_years_analysis, extras
+
+
+@st.cache_resource(ttl=LOAN_TTL, max_entries=LOAN_MAX_ENTRIES, show_spinner=False)
+def get_loan(loan_inputs: dict) -> Loan:
+    return Loan(LoanInput(**loan_inputs))
+
+
+@st.cache_data(ttl=LOAN_TTL, max_entries=LOAN_MAX_ENTRIES, show_spinner=False)
+def amortize(loan_inputs: dict) -> pd.DataFrame:
+    return get_loan(loan_inputs).amort_table
+
+
+@st.cache_data(ttl=LOAN_TTL, max_entries=LOAN_MAX_ENTRIES, show_spinner=False)
+def detail(loan_inputs: dict) -> pd.DataFrame:
+    return get_loan(loan_inputs).amort_table_detail()
+
+
+@st.cache_resource(ttl=LOAN_TTL, max_entries=LOAN_MAX_ENTRIES, show_spinner=False)
+def loan_plots(loan_inputs: dict, num_years: int, backend: str='matplotlib') -> LoanPlots:
+    return LoanPlots(get_loan(loan_inputs), num_years, backend)
+
+
+@st.cache_data(ttl=LOAN_TTL, max_entries=LOAN_MAX_ENTRIES, show_spinner=False)
+def rent_vs_buy(loan_inputs: dict, rent: float, rent_increase: float, mkt_return: float=.10,
+                cap_gains_tax: float=.15, num_years_analysis: int=10) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    return get_loan(loan_inputs).rent_vs_buy(rent, rent_increase, mkt_return, cap_gains_tax, num_years_analysis)
+
+
+@st.cache_data(ttl=LOAN_TTL, max_entries=LOAN_MAX_ENTRIES, show_spinner=False)
+def down_pmt_sweep_results(loan_inputs: dict, down_pmts: tuple, mkt_return: float=.10) -> dict:
+    '''
+    CompareDownPayments.sweep_down_pmts arrays
+    '''
+    return CompareDownPayments(get_loan(loan_inputs), list(down_pmts)).sweep_down_pmts(mkt_return=mkt_return)
+
+
+def down_pmt_sweep(loan_inputs: dict, down_pmts: tuple, mkt_return: float=.10) -> CompareDownPayments:
+    '''
+    CompareDownPayments of the caller holding the cached sweep results, get_summary and
+    render_summary set years_compare on it so it isn't shared between sessions
+    '''
+    cdp = CompareDownPayments(get_loan(loan_inputs), list(down_pmts))
+    cdp.sweep_results = down_pmt_sweep_results(loan_inputs, down_pmts, mkt_return)
+    return cdp
+
+
+@st.cache_data(ttl=LOAN_TTL, max_entries=LOAN_MAX_ENTRIES, show_spinner=False)
+def down_pmt_summary(loan_inputs: dict, down_pmts: tuple, mkt_return: float=.10, years_compare: int=15) -> pd.DataFrame:
+    return down_pmt_sweep(loan_inputs, down_pmts, mkt_return).get_summary(years_compare)
+
+
+# rebuilt with the FRED frames so a long running server picks up new keys, transports and cache settings
+@st.cache_resource(ttl=FRED_TTL, show_spinner=False)
+def get_fred():
+    from econ.fred_econ import FRED
+    return FRED()
+
+
+@st.cache_data(ttl=FRED_TTL, max_entries=FRED_MAX_ENTRIES, show_spinner=False)
+def fred_frame(data_ids: tuple, start_date: str, end_date: str=None, frequency: str=None) -> pd.DataFrame:
+    '''
+    FRED.get_many of data_ids, a date column and one column per series
+    '''
+    return get_fred().get_many(list(data_ids), start_date, end_date, frequency)
+
+
+@st.cache_data(ttl=FRED_TTL, max_entries=FRED_MAX_ENTRIES, show_spinner=False)
+def fred_series(data_id: str, start_date: str, end_date: str=None, frequency: str=None) -> pd.DataFrame:
+    return get_fred().get_fred_data(data_id, start_date, end_date, frequency)
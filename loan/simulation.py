@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+from typing import Tuple
+
+from utils.compare import invest_difference, yearly_max
+from .core import Loan
+
+
+def simulate_rent_vs_buy(loan: Loan, rent: float, rent_increase: float, appr_mean: float=None, appr_vol: float=.05,
+                         mkt_return: float=.10, mkt_vol: float=.15, corr: float=0, cap_gains_tax: float=.15,
+                         num_years_analysis: int=10, n_paths: int=10000, chunk_size: int=1000, seed: int=None,
+                         percentiles: Tuple[float]=(5, 25, 50, 75, 95)) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    '''
+    Monte Carlo version of Loan.rent_vs_buy with uncertain home appreciation and market returns
+
+    Each path draws normal per period returns with annual mean/vol scaled by pmt_freq for home
+    appreciation and the market (correlated by corr). Paths are simulated as (chunk_size, periods)
+    arrays covering num_years_analysis and reduced to yearly return_total before the next chunk, so memory is bounded by
+    chunk_size regardless of n_paths.
+
+    Parameters
+    ----------
+    loan : instance of Loan class
+    rent : cost of rental unit at current time
+    rent_increase : how much rent grows each year
+    appr_mean, appr_vol : annual home appreciation mean (defaults to loan.appr_rate) and volatility
+    mkt_return, mkt_vol : annual stock market return mean and volatility
+    corr : correlation between home appreciation and market returns
+    cap_gains_tax : capital gains tax deducted from market returns
+    num_years_analysis : number of years to report
+    n_paths : number of simulated paths
+    chunk_size : number of paths simulated at once
+    seed : seed for reproducible runs (results also depend on chunk_size)
+    percentiles : percentiles of return_total to report
+
+    Returns 2 dataframes in a tuple, each with a year column and one column per percentile (e.g. p50)
+    1. Yearly return_total of home owner
+    2. Yearly return_total of renter
+    '''
+    assert loan.num_years >= num_years_analysis, 'Loan arg num_years shorter than num_years_analysis'
+    assert -1 <= corr <= 1, 'corr must be between -1 and 1'
+
+    batch = loan._batch_row()
+    freq = loan.pmt_freq
+    nper = num_years_analysis * freq
+    appr_mean = loan.appr_rate if appr_mean is None else appr_mean
+    rng = np.random.default_rng(seed)
+
+    year = batch.year[0, :nper]
+    rent_pmts = ((1+rent_increase)**(year - 1)) * rent
+    rent_cumulative = rent_pmts.cumsum()
+
+    owner = np.empty((n_paths, num_years_analysis))
+    renter = np.empty((n_paths, num_years_analysis))
+    for start in range(0, n_paths, chunk_size):
+        n = min(chunk_size, n_paths - start)
+        z_home = rng.standard_normal((n, nper))
+        z_mkt = corr*z_home + np.sqrt(1 - corr**2)*rng.standard_normal((n, nper))
+
+        home_growth = 1 + appr_mean/freq + appr_vol/np.sqrt(freq)*z_home
+        mkt_growth = (1 + mkt_return/freq + mkt_vol/np.sqrt(freq)*z_mkt).cumprod(axis=1)
+        detail = batch.detail(home_value=loan.asset_start_value*home_growth.cumprod(axis=1), stop=nper)
+        all_in_pmts = detail['all_in_pmts']
+
+        # (n, 2, periods) with owner then renter on axis 1
+        costs = np.stack([all_in_pmts, np.broadcast_to(rent_pmts, all_in_pmts.shape)], axis=1)
+        base = np.stack([detail['profit'], np.broadcast_to(-rent_cumulative, all_in_pmts.shape)], axis=1)
+        total = yearly_max(invest_difference(costs, mkt_growth[:, None, :], cap_gains_tax, base)['return_total'], freq)
+
+        owner[start:start+n] = total[:, 0]
+        renter[start:start+n] = total[:, 1]
+
+    def bands(values):
+        df = pd.DataFrame(np.percentile(values, percentiles, axis=0).T,
+                          columns=['p{:g}'.format(p) for p in percentiles])
+        df.insert(0, 'year', np.arange(1, num_years_analysis + 1))
+        return df
+
+    return (bands(owner), bands(renter))
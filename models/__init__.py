@@ -1 +1,2 @@
-from .models import Models, LinReg
\ No newline at end of file
+from .models import Models, LinReg, OnlineLinReg
+from .backtest import backtest
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple
+
+
+def _forecast(origins, horizons, x, xtx, xty, yty, window, alpha):
+    '''
+    OLS fit at each origin (rows before it) and forecasts of rows origin + h - 1, all origins at once
+
+    Rows past the end of the data are forecast from the last row and dropped by the caller
+    '''
+    end = origins
+    start = np.zeros_like(origins) if window is None else origins - window
+    a = xtx[end] - xtx[start]
+    b = xty[end] - xty[start]
+    nobs = end - start
+
+    p_inv = np.linalg.pinv(a)
+    params = np.einsum('oij,oj->oi', p_inv, b)
+    ssr = (yty[end] - yty[start]) - np.einsum('oi,oi->o', params, b)
+    df_resid = nobs - x.shape[1]
+    scale = np.clip(ssr, 0, None) / df_resid
+
+    rows = origins[:, None] + horizons[None, :] - 1
+    x_target = x[np.minimum(rows, len(x) - 1)]
+    mean = np.einsum('ohi,oi->oh', x_target, params)
+    leverage = np.einsum('ohi,oij,ohj->oh', x_target, p_inv, x_target)
+    se_obs = np.sqrt(scale[:, None] * (1 + leverage))
+    from scipy import stats
+    q = stats.t.ppf(1 - alpha/2, df_resid)[:, None]
+    return rows, mean, mean - q*se_obs, mean + q*se_obs
+
+
+def backtest(x: pd.DataFrame, y: pd.Series, horizons: int=24, min_train: int=36, window: int=None,
+             alpha: float=.05, n_jobs: int=1) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    '''
+    Rolling origin backtest of LinReg forecasts
+
+    Every origin t from min_train on fits OLS (with a constant, as LinReg) on the rows before t
+    and forecasts rows t, ..., t + horizons - 1 with their realized regressors, so it measures the
+    model's error given the regressor path (e.g. the FFR forecast) rather than the regressor forecast.
+    Fits come from cumulative sums of X'X, X'y and y'y, so all origins x horizons are batched
+    linear algebra instead of one train/predict per origin.
+
+    Parameters
+    ----------
+    x : regressors ordered by date
+    y : target ordered by date
+    horizons : forecast horizons 1 to horizons (rows ahead of the origin)
+    min_train : rows in the first training set
+    window : optional rolling training window length, defaults to an expanding window
+    alpha : significance level of the prediction intervals
+    n_jobs : threads evaluating chunks of origins in parallel
+
+    Returns 2 dataframes in a tuple
+    1. Forecasts with origin (date of the first forecast row), horizon, date, actual, mean,
+       obs_ci_lower, obs_ci_upper and error (actual - mean)
+    2. By horizon, number of forecasts, MAE, RMSE, bias (mean error) and coverage (share of actuals
+       within the interval)
+    '''
+    import statsmodels.api as sm
+    x = sm.add_constant(x)
+    n, p = x.shape
+    window = None if window is None else max(window, p + 1)
+    first = max(min_train, p + 1) if window is None else max(min_train, window)
+    assert n - first >= 1, 'Not enough rows for min_train/window'
+    dates = x.index
+    x = x.to_numpy(dtype=float)
+    y = y.to_numpy(dtype=float)
+
+    # cumulative sums over rows before each index
+    xtx = np.concatenate([np.zeros((1, p, p)), np.cumsum(x[:, :, None] * x[:, None, :], axis=0)])
+    xty = np.concatenate([np.zeros((1, p)), np.cumsum(x * y[:, None], axis=0)])
+    yty = np.concatenate([[0], np.cumsum(y**2)])
+
+    h = np.arange(1, horizons + 1)
+    origins = np.arange(first, n)
+    chunks = [c for c in np.array_split(origins, max(n_jobs, 1)) if len(c)]
+    with ThreadPoolExecutor(max_workers=max(n_jobs, 1)) as pool:
+        results = list(pool.map(lambda o: _forecast(o, h, x, xtx, xty, yty, window, alpha), chunks))
+    rows, mean, lower, upper = (np.concatenate(r) for r in zip(*results))
+
+    valid = rows < n
+    origin_rows = np.broadcast_to(origins[:, None], rows.shape)[valid]
+    df = pd.DataFrame({'origin': dates[origin_rows], 'horizon': np.broadcast_to(h, rows.shape)[valid],
+                       'date': dates[rows[valid]], 'actual': y[rows[valid]], 'mean': mean[valid],
+                       'obs_ci_lower': lower[valid], 'obs_ci_upper': upper[valid]})
+    df['error'] = df['actual'] - df['mean']
+
+    covered = (df['actual'] >= df['obs_ci_lower']) & (df['actual'] <= df['obs_ci_upper'])
+    summary = df.assign(abs_error=df['error'].abs(), sq_error=df['error']**2, covered=covered).groupby('horizon').agg(
+        n=('error', 'size'), mae=('abs_error', 'mean'), rmse=('sq_error', 'mean'), bias=('error', 'mean'),
+        coverage=('covered', 'mean'))
+    summary['rmse'] = np.sqrt(summary['rmse'])
+    return (df, summary.reset_index())
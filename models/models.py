@@ -1,11 +1,16 @@
 #%%
+import hashlib
+import json
+import os
+import pickle
+import re
+import numpy as np
 import pandas as pd
 
-from econ.fred_econ import FRED
-from sklearn.linear_model import LinearRegression
-from sklearn.model_selection import TimeSeriesSplit, KFold
-import sklearn.metrics as metrics
-import statsmodels.api as sm
+from utils.files import atomic_write
+
+# statsmodels, scikit-learn and scipy are imported by the methods using them so importing the
+# module (e.g. for default_model_dir or a cached model) doesn't load them
 
 # %%
 
@@ -19,21 +24,143 @@ class Models:
         pass
     
     
+def default_model_dir() -> str:
+    '''
+    MODEL_CACHE_DIR environment variable, else ~/.cache/loanpy/models
+    '''
+    return os.environ.get('MODEL_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'loanpy', 'models')
+
+
 class LinReg(Models):
+    '''
+    OLS regression of y on x with a constant
+
+    cache_dir : optional folder of saved models, train() and test() load the fitted model and CV table
+        saved for the same fingerprint (training data and hyperparameters) instead of refitting
+    cache_keep : saved fingerprints kept in cache_dir per model (columns and hyperparameters), older
+        ones are deleted when a new one is saved since every data update gives a new fingerprint
+    '''
+
     def __init__(self, x: pd.DataFrame, y: pd.Series, time_series_split: bool=True,
-                 k_cv: int=5, num_splits: int=5) -> None:
+                 k_cv: int=5, num_splits: int=5, cache_dir: str=None, cache_keep: int=3) -> None:
+        assert cache_keep >= 1, 'cache_keep must be at least 1'
         
         super().__init__(x, y)
         self.k_cv = k_cv
         self.num_splits = num_splits
         self.time_series_split = time_series_split
+        import statsmodels.api as sm
         self.x = sm.add_constant(x)
+        self.cv_table = None
+        self.cache_dir = cache_dir
+        self.cache_keep = cache_keep
+        self._saved = None
+
+    def _params(self) -> dict:
+        return {'model': type(self).__name__, 'x': [str(c) for c in self.x.columns], 'y': str(self.y.name),
+                'time_series_split': self.time_series_split, 'k_cv': self.k_cv, 'num_splits': self.num_splits}
+
+    def model_key(self) -> str:
+        '''
+        Hash of the columns and hyperparameters, the same for every update of the training data
+        '''
+        return hashlib.sha256(json.dumps(self._params(), sort_keys=True).encode()).hexdigest()
+
+    def fingerprint(self) -> str:
+        '''
+        Hash of the training data (values, index and names) and hyperparameters
+        '''
+        h = hashlib.sha256()
+        h.update(pd.util.hash_pandas_object(self.x, index=True).to_numpy().tobytes())
+        h.update(pd.util.hash_pandas_object(self.y, index=True).to_numpy().tobytes())
+        h.update(json.dumps(self._params(), sort_keys=True).encode())
+        return h.hexdigest()
+
+    def save(self, path: str=None) -> str:
+        '''
+        Pickles the data, hyperparameters, fitted model and CV table to path (defaults to the
+        fingerprint's file in cache_dir, pruned to the newest cache_keep of the model) and returns the path
+        '''
+        prune = path is None
+        path = path or self._cache_path()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        state = {'fingerprint': self.fingerprint(), 'x': self.x, 'y': self.y, 'model': self.model,
+                 'cv_table': self.cv_table, 'params': {'time_series_split': self.time_series_split,
+                                                       'k_cv': self.k_cv, 'num_splits': self.num_splits}}
+        atomic_write(path, lambda f: pickle.dump(state, f))
+        self._saved = state
+        if prune:
+            self._prune(path)
+        return path
+
+    @classmethod
+    def load(cls, path: str, cache_dir: str=None) -> 'LinReg':
+        '''
+        LinReg from a file written by save(), ready to predict() if it was trained
+        '''
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+        lm = cls(state['x'], state['y'], cache_dir=cache_dir, **state['params'])
+        lm.model = state['model']
+        lm.cv_table = state['cv_table']
+        lm._saved = state
+        return lm
+
+    def _cache_path(self) -> str:
+        assert self.cache_dir is not None, 'Pass a path or set cache_dir'
+        return os.path.join(self.cache_dir, 'linreg_{}_{}.pkl'.format(self.model_key()[:12], self.fingerprint()[:24]))
+
+    def _prune(self, keep_path: str) -> None:
+        '''
+        Deletes all but the newest cache_keep saved fingerprints of this model, and files named
+        without a model key (linreg_<fingerprint>.pkl) which no model would read again
+        '''
+        prefix = 'linreg_{}_'.format(self.model_key()[:12])
+        names = [f for f in os.listdir(self.cache_dir) if f.endswith('.pkl') and
+                 (f.startswith(prefix) or re.fullmatch(r'linreg_[0-9a-f]{24}\.pkl', f))]
+        paths = [os.path.join(self.cache_dir, f) for f in names]
+        paths = [p for p in paths if os.path.abspath(p) != os.path.abspath(keep_path)]
+        paths.sort(key=os.path.getmtime, reverse=True)
+        for p in paths[self.cache_keep - 1:]:
+            try:
+                os.remove(p)
+            except FileNotFoundError:
+                pass
+
+    def _cached(self, name: str):
+        if self._saved is None and self.cache_dir is not None and os.path.exists(self._cache_path()):
+            with open(self._cache_path(), 'rb') as f:
+                state = pickle.load(f)
+            if state['fingerprint'] == self.fingerprint():
+                self._saved = state
+        return None if self._saved is None else self._saved[name]
     
-    def test(self) -> pd.DataFrame:
-        if self.time_series_split:
-            data_split = TimeSeriesSplit(self.num_splits)
-        else:
-            data_split = KFold(self.num_splits)
+    def test(self, fast: bool=False) -> pd.DataFrame:
+        '''
+        Cross validated MSE of train and test sets and adjusted R-squared by fold
+
+        fast : solve each fold from the normal equations instead of refitting OLS. TimeSeriesSplit
+            training sets are prefixes so X'X and X'y are extended by each fold's new rows, KFold
+            training sets are the full X'X and X'y less the test fold. Gives the same table.
+        '''
+        cv_table = self._cached('cv_table')
+        if cv_table is None:
+            from sklearn.model_selection import TimeSeriesSplit, KFold
+            if self.time_series_split:
+                data_split = TimeSeriesSplit(self.num_splits)
+            else:
+                data_split = KFold(self.num_splits)
+            cv_table = self._test_fast(data_split) if fast else self._test_ols(data_split)
+            self.cv_table = cv_table
+            if self.cache_dir is not None:
+                self.model = self.model if self.model is not None else self._cached('model')
+                self.save()
+        self.cv_table = cv_table
+        return cv_table.copy()
+
+    def _test_ols(self, data_split) -> pd.DataFrame:
+        import sklearn.metrics as metrics
+        import statsmodels.api as sm
         data = {}
         folds = []
         ms_errors_train = []
@@ -59,6 +186,51 @@ class LinReg(Models):
         data['MSE_train'] = ms_errors_train
         data['MSE_test'] = ms_errors_test
         data['R-Squared Adj'] = r2
+        return LinReg._cv_table(data)
+
+    def _test_fast(self, data_split) -> pd.DataFrame:
+        x = self.x.to_numpy(dtype=float)
+        y = self.y.to_numpy(dtype=float)
+        # statsmodels centers R-squared when the design has a constant column
+        k_constant = int(((np.ptp(x, axis=0) == 0) & (x[0] != 0)).any())
+
+        if self.time_series_split:
+            xtx = np.zeros((x.shape[1], x.shape[1]))
+            xty = np.zeros(x.shape[1])
+            seen = 0
+        else:
+            xtx = x.T @ x
+            xty = x.T @ y
+
+        data = {'folds': [], 'MSE_train': [], 'MSE_test': [], 'R-Squared Adj': []}
+        for i, (train_index, test_index) in enumerate(data_split.split(x)):
+            if self.time_series_split:
+                new = slice(seen, len(train_index))
+                xtx += x[new].T @ x[new]
+                xty += x[new].T @ y[new]
+                seen = len(train_index)
+                fold_xtx, fold_xty = xtx, xty
+            else:
+                fold_xtx = xtx - x[test_index].T @ x[test_index]
+                fold_xty = xty - x[test_index].T @ y[test_index]
+
+            beta = np.linalg.pinv(fold_xtx) @ fold_xty
+            y_train = y[train_index]
+            resid_train = y_train - x[train_index] @ beta
+            resid_test = y[test_index] - x[test_index] @ beta
+
+            n = len(train_index)
+            ssr = resid_train @ resid_train
+            tss = ((y_train - y_train.mean())**2).sum() if k_constant else y_train @ y_train
+            df_resid = n - np.linalg.matrix_rank(fold_xtx)
+            data['folds'].append(i)
+            data['MSE_train'].append(ssr / n)
+            data['MSE_test'].append(resid_test @ resid_test / len(test_index))
+            data['R-Squared Adj'].append(1 - (n - k_constant) / df_resid * ssr / tss)
+        return LinReg._cv_table(data)
+
+    @staticmethod
+    def _cv_table(data: dict) -> pd.DataFrame:
         df = pd.DataFrame(data)
         avg_row = {'folds': 'Avg', 'MSE_train': df['MSE_train'].mean(),
                    'MSE_test': df['MSE_test'].mean(), 'R-Squared Adj': df['R-Squared Adj'].mean()}
@@ -67,7 +239,14 @@ class LinReg(Models):
         
 
     def train(self) -> None:
-        lm = sm.OLS(self.y, self.x).fit()
+        lm = self._cached('model')
+        if lm is None:
+            import statsmodels.api as sm
+            lm = sm.OLS(self.y, self.x).fit()
+            self.model = lm
+            if self.cache_dir is not None:
+                self.cv_table = self.cv_table if self.cv_table is not None else self._cached('cv_table')
+                self.save()
         self.model = lm
     
     def predict(self, x_new: pd.DataFrame, alpha: float=.05) -> pd.DataFrame:
@@ -82,3 +261,82 @@ class LinReg(Models):
         # sm.qqplot(resids, fit=True, line='45')
         pass
 
+
+
+class OnlineLinReg(Models):
+    '''
+    OLS regression of y on x with a constant, updated one row at a time by recursive least squares
+
+    forgetting : weight decay per new row in (0, 1], 1 weights all rows equally and matches LinReg,
+        lower values discount older rows by forgetting**age
+
+    Each update costs O(p^2) for p columns. The coefficients, P = (X'WX)^-1 and the weighted
+    residual sum of squares are kept so predict() gives the same intervals as LinReg.predict.
+    '''
+
+    def __init__(self, x: pd.DataFrame, y: pd.Series, forgetting: float=1.0) -> None:
+        super().__init__(x, y)
+        assert 0 < forgetting <= 1, 'forgetting must be in (0, 1]'
+        self.forgetting = forgetting
+        import statsmodels.api as sm
+        self.x = sm.add_constant(x)
+        self.columns = self.x.columns
+        self.params = None
+        self.last_index = None
+
+    def train(self) -> None:
+        '''
+        Fits the initial rows in one batch, weighted the same way the updates are
+        '''
+        x = self.x.to_numpy(dtype=float)
+        y = self.y.to_numpy(dtype=float)
+        w = self.forgetting**np.arange(len(x) - 1, -1, -1)
+        self.P = np.linalg.pinv(x.T @ (x * w[:, None]))
+        self.params = self.P @ (x.T @ (y * w))
+        resid = y - x @ self.params
+        self.ssr = (w * resid**2).sum()
+        self.nobs = w.sum()
+        self.last_index = self.x.index[-1]
+        self.model = self
+
+    def update(self, x_row: np.ndarray, y_value: float) -> None:
+        '''
+        Applies one new observation, x_row includes the constant
+        '''
+        lam = self.forgetting
+        x_row = np.asarray(x_row, dtype=float)
+        px = self.P @ x_row
+        denom = lam + x_row @ px
+        gain = px / denom
+        error = y_value - x_row @ self.params
+        self.params = self.params + gain * error
+        self.ssr = lam * self.ssr + error**2 * lam / denom
+        self.P = (self.P - np.outer(gain, px)) / lam
+        self.nobs = lam * self.nobs + 1
+
+    def refresh(self, x: pd.DataFrame, y: pd.Series) -> int:
+        '''
+        Applies the rows of x and y indexed after the last applied row, returns the number applied
+        '''
+        if self.params is None:
+            self.train()
+        new = x.index > self.last_index
+        if not new.any():
+            return 0
+        import statsmodels.api as sm
+        x_new = sm.add_constant(x.loc[new], has_constant='add')[self.columns].to_numpy(dtype=float)
+        for x_row, y_value in zip(x_new, y.loc[new].to_numpy(dtype=float)):
+            self.update(x_row, y_value)
+        self.last_index = x.index[new][-1]
+        return int(new.sum())
+
+    def predict(self, x_new: pd.DataFrame, alpha: float=.05) -> pd.DataFrame:
+        x = x_new[self.columns].to_numpy(dtype=float)
+        mean = x @ self.params
+        df_resid = self.nobs - np.linalg.matrix_rank(self.P)
+        scale = self.ssr / df_resid
+        se_obs = np.sqrt(scale * (1 + np.einsum('ij,jk,ik->i', x, self.P, x)))
+        from scipy import stats
+        q = stats.t.ppf(1 - alpha/2, df_resid)
+        return pd.DataFrame({'mean': mean, 'obs_ci_lower': mean - q*se_obs, 'obs_ci_upper': mean + q*se_obs},
+                            index=x_new.index)
@@ -3,7 +3,8 @@ import streamlit as st
 from datetime import date
 from dateutil.relativedelta import relativedelta
 
-from econ.fred_econ import FRED
+from loan import service
+from utils.figure_cache import figure_cache
 
 st.set_page_config(
     layout='wide'
@@ -14,20 +15,18 @@ today = str(date.today())
 prev = str(date.today() - relativedelta(years=5))
 #today = '2023-12-31'
 #%%
-fred = FRED()
-df_mgt = fred.get_fred_data('mgt_rate', prev, today, 'm')
-df_hpi = fred.get_fred_data('home_price_index', prev, today, 'm')
-df_ai = fred.get_fred_data('afford_index', prev, today, 'm')
-df_cpi = fred.get_fred_data('cpi', prev, today, 'm')
+fred = service.get_fred()
+df_econ = service.fred_frame(('mgt_rate', 'home_price_index', 'afford_index', 'cpi'), prev, today, 'm')
+df_mgt, df_hpi, df_ai, df_cpi = [df_econ[['date', c]].dropna() for c in df_econ.columns[1:]]
 
 st.markdown("<h1 style='text-align: center; color: black;'>Economic Data</h1>", unsafe_allow_html=True)
 
 col1, col2 = st.columns(2, )
 
 with col1:
-    st.pyplot(fred.plot(df_mgt, '30 Year Mortgage Rate', 'Rate'), use_container_width=True)
+    st.image(figure_cache.render(fred.plot, df_mgt, '30 Year Mortgage Rate', 'Rate'), use_column_width=True)
 
-    st.pyplot(fred.plot(df_hpi, 'Home Price Index', 'Index'), use_container_width=True)
+    st.image(figure_cache.render(fred.plot, df_hpi, 'Home Price Index', 'Index'), use_column_width=True)
     st.markdown(
         '''
         *The S&P CoreLogic Case-Shiller 10-City Composite Home Price Index
@@ -43,9 +42,9 @@ with col1:
     )
 
 with col2:
-    st.pyplot(fred.plot(df_cpi, 'CPI', 'Inflation'), use_container_width=True)
+    st.image(figure_cache.render(fred.plot, df_cpi, 'CPI', 'Inflation'), use_column_width=True)
 
-    st.pyplot(fred.plot(df_ai, 'Home Affordability Index', 'Index'), use_container_width=True)
+    st.image(figure_cache.render(fred.plot, df_ai, 'Home Affordability Index', 'Index'), use_column_width=True)
     st.markdown(
         '''
         *Measures the degree to which a typical family can afford the 
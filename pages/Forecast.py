@@ -3,17 +3,13 @@ import streamlit as st
 from datetime import date
 from dateutil.relativedelta import relativedelta
 import matplotlib.pyplot as plt
-import requests
-import json
-import pandas as pd
-import numpy as np
-import os
 import statsmodels.api as sm
-from dotenv import load_dotenv, find_dotenv
-load_dotenv()
 
-from econ.fred_econ import FRED
-from models.models import LinReg
+from loan import service
+from econ.store import SeriesStore
+from econ.interpolate import interpolate_series
+from models.models import LinReg, default_model_dir
+from utils.figure_cache import figure_cache
 
 st.set_page_config(
     layout='wide'
@@ -26,67 +22,26 @@ st.set_page_config(
 prev = '2016-09-01'
 today = str(date.today())
 #%%
-fred = FRED()
-df_mgt = fred.get_fred_data('mgt_rate', prev, today, 'm')
-df_cpi = fred.get_fred_data('cpi', prev, today, 'm')
-df_ffr = fred.get_fred_data('ffr', prev, today, 'm')
+df_econ = service.fred_frame(('mgt_rate', 'cpi', 'ffr'), prev, today, 'm')
+df_mgt, df_ffr = [df_econ[['date', c]].dropna() for c in ('mgt_rate', 'ffr')]
 
-try:
-    api_key = st.secrets["FRED_API_KEY"]
-except:
-    api_key = os.environ.get('fred_api_key')
+df_ffr_fcst = service.fred_series('ffr_fcst', '2024-01-01').rename(columns={'ffr_fcst': 'value'})
 
-series_url = 'https://api.stlouisfed.org/fred/series/observations'
-params = {'series_id': 'FEDTARCTM',
-        'api_key': api_key, 
-        'file_type': 'json',
-        'observation_start': '2024-01-01',
-        }
-df_ffr_fcst = pd.DataFrame()
-r = json.loads(requests.get(series_url, params=params).text)
-data = {'date':[], 'value':[]}
-for i in r['observations']:
-    if i['value'] == '.':
-        continue
-    else:
-        data['value'].append(float(i['value']))
-        data['date'].append(pd.to_datetime(i['date']))
-df_ffr_fcst = pd.DataFrame(data)
-
-df = df_mgt.set_index('date').merge(df_cpi.set_index('date'), how='left',
-                                    left_index=True, right_index=True). \
-                                    rename(columns={'value_x':'mgt_rate', 'value_y':'cpi'})
-df = df.merge(df_ffr.set_index('date'), how='left',
-                                    left_index=True, right_index=True). \
-                                    rename(columns={'value':'ffr'})
+store = SeriesStore(frequency='m')
+store.put_frame(df_econ)
+df = store.frame(['mgt_rate', 'ffr'], prev, today, freq='M', how='inner')
 
 x = df.loc[:,['ffr']]
 y = df.loc[:,'mgt_rate']
 
-lm = LinReg(x, y)
-df_test = lm.test()
+lm = LinReg(x, y, cache_dir=default_model_dir())
+df_test = lm.test(fast=True)
 lm.train()
 
-data = {}
-dates = []
-vals = []
-for i, d in enumerate(df_ffr_fcst['date']):
-    if i == 0:
-        continue
-    else:
-        dates_new = pd.date_range(df_ffr_fcst['date'].iloc[i-1], df_ffr_fcst['date'].iloc[i],freq='M')
-        dates.append(dates_new)
-        vals_new = vals.append(np.linspace(df_ffr_fcst['value'].iloc[i-1], df_ffr_fcst['value'].iloc[i], len(dates_new)))
-data['date'] = [dt for d in dates for dt in d ]
-data['value'] = [vl for v in vals for vl in v]
-df_ffr_new = pd.DataFrame(data).set_index('date')
-
+df_ffr_new = interpolate_series(df_ffr_fcst, freq='MS').set_index('date')
 df_ffr_new = sm.add_constant(df_ffr_new, has_constant='add')
 
 preds = lm.predict(df_ffr_new).reset_index()
-def rollback(row):
-    return pd.offsets.MonthBegin().rollback(row)
-preds['date'] = preds['date'].apply(rollback)
 preds['ffr'] = df_ffr_new['value'].values
 
 def mgt_ffr_plot(df_mgt, df_ffr, df_preds):
@@ -104,7 +59,7 @@ def mgt_ffr_plot(df_mgt, df_ffr, df_preds):
 col1, col2 = st.columns(2, )
 
 with col1:
-    st.pyplot(mgt_ffr_plot(df_mgt, df_ffr, preds), use_container_width=True)
+    st.image(figure_cache.render(mgt_ffr_plot, df_mgt, df_ffr, preds), use_column_width=True)
 with col2:
     st.markdown(
         '''
@@ -1,8 +1,37 @@
 #%%
 from loan.core import Loan
 from loan.loan_input import LoanInput
+from loan.batch import LoanBatch
+from loan.compare_down_pmts import CompareDownPayments
+from loan.cache import LoanCache
+from loan.simulation import simulate_rent_vs_buy
+from loan.plots import LoanPlots
+from loan import service
+from utils.npf_amort import amort
+from utils.grid import SensitivityGrid
+from utils.utils import pmt_matrix, affordability_batch, rent_vs_buy, buy_vs_buy
+from utils.solvers import solve_rate
+from utils.figure_cache import FigureCache
+from utils.files import atomic_write
+from benchmarks.suite import run
+from models.models import LinReg, OnlineLinReg
+from models.backtest import backtest
+from econ.fred_econ import FRED, parse_observations
+from econ.transport import RecordingTransport, ReplayTransport
+from econ.store import SeriesStore
+from econ.interpolate import interpolate_series
 import pytest
 import numpy as np
+import numpy_financial as npf
+import pandas as pd
+import statsmodels.api as sm
+import json
+import os
+import subprocess
+import sys
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
 
 #%%
 @pytest.fixture
@@ -114,13 +143,495 @@ def test_all_in_pmts(loan_data):
     assert np.allclose(all_in_calc_b, loan_b['all_in_pmts']), "All in payments calc DOES NOT equal all_in_pmts 15 year loan"
 
 
+def test_loan_batch(loan_data):
+    loan_a, loan_b = loan_data['loan_obj']
+    batch = LoanBatch(asset_amt=300000, rate_annual=.03, num_years=[30, 15], down_pmt=.20)
 
+    assert batch.principal.shape == (2, loan_a.nper), "Batch arrays NOT padded to longest loan"
+    assert not batch.mask[1, loan_b.nper:].any(), "Periods past loan term NOT masked"
+    assert np.allclose(batch.end_bal[1, loan_b.nper:], 0), "Padded periods DO NOT have 0 balance"
 
+    for i, loan in enumerate([loan_a, loan_b]):
+        df = amort(loan.amt, loan.nper, loan.pmt, loan.pmt_freq, loan.rate)
+        df_batch = batch[i].amort_table
+        for col in df.columns:
+            assert np.allclose(df[col], df_batch[col]), "Batch {} DOES NOT match amort for loan {}".format(col, i)
 
+    row = batch[1]._batch_row()
+    assert np.shares_memory(row.end_bal, batch.end_bal), "Batch loan re-amortized instead of viewing the batch"
+    assert np.allclose(batch[1].amort_table_detail(), loan_b.amort_table_detail()), "Batch loan detail DOES NOT match Loan"
 
 
+def test_detail_yearly_values(loan_data):
+    loan = loan_data['loan_obj'][0]
+    df = loan_data['loan_data'][0]
 
+    first_of_year = df.groupby('year')['home_value'].transform('min')
+    pmi_expected = np.where(df['ltv_ratio'] > .8, loan.amt*.01/loan.pmt_freq, 0)
 
+    assert np.allclose(df['prop_tax'], first_of_year*loan.tax/12), "Property tax DOES NOT use min home value of each year"
+    assert np.allclose(df['pmi'], pmi_expected), "PMI DOES NOT follow loan to value ratio"
+    assert 'home_value' not in loan.amort_table.columns, "amort_table_detail mutated amort_table"
 
 
+def test_down_pmt_sweep(loan_data):
+    loan = loan_data['loan_obj'][0]
+    down_pmts = [.05, .10, .20, .30]
 
+    cdp = CompareDownPayments(loan, down_pmts)
+    cdp.get_compare_down_pmts_data()
+    cdp.compare_down_pmts(mkt_return=.08)
+    summary_loop = cdp.get_summary(years_compare=10)
+
+    cdp.sweep_down_pmts(mkt_return=.08)
+    summary_sweep = cdp.get_summary(years_compare=10)
+
+    assert cdp.sweep_results['total_profit'].shape == (len(down_pmts), loan.nper), "Sweep results NOT shaped (down_pmts, nper)"
+    assert np.allclose(summary_loop['total_profit'], summary_sweep['total_profit']), "Sweep DOES NOT match per loan comparison"
+
+
+def test_lazy_schedule():
+    loan = Loan(LoanInput(asset_amt=300000, rate_annual=.05, num_years=30, down_pmt=.10))
+    df = loan.schedule(170, 190)
+
+    assert loan._amort_table is None, "schedule built the full amortization table"
+    assert np.allclose(loan.balance_at(180), df.loc[179, 'end_bal']), "balance_at DOES NOT match schedule"
+    assert np.allclose(loan.balance_at(0), loan.amt), "balance_at(0) DOES NOT equal loan amount"
+
+    table = loan.amort_table
+    assert np.allclose(table.iloc[170:190], df), "schedule DOES NOT match amort_table slice"
+    assert np.allclose(loan.cumulative_interest(180), table['interest'].iloc[:180].sum()), "cumulative_interest DOES NOT match amort_table"
+
+
+def test_loan_cache():
+    cache = LoanCache(maxsize=2)
+    params = [LoanInput(asset_amt=300000, rate_annual=.05, num_years=30, down_pmt=d) for d in [.1, .2, .3]]
+
+    df = cache.amort_table_detail(params[0])
+    df['profit'] = 0
+    df_hit = cache.amort_table_detail(LoanInput(**params[0].model_dump()))
+
+    assert (cache.hits, cache.misses) == (1, 1), "Equal LoanInput DID NOT hit the cache"
+    assert not np.allclose(df_hit['profit'], 0), "Mutating a returned table corrupted the cache"
+
+    cache.amort_table_detail(params[1])
+    cache.amort_table_detail(params[2])
+    cache.amort_table_detail(params[0])
+    assert len(cache) == 2 and cache.misses == 4, "Least recently used table NOT evicted"
+
+    tiny = LoanCache(max_bytes=1)
+    tiny.amort_table(params[0])
+    assert len(tiny) == 0 and tiny.nbytes == 0, "Table larger than max_bytes cached"
+
+
+def test_simulate_rent_vs_buy(loan_data):
+    loan = loan_data['loan_obj'][0]
+    df_year, df_rent_year = loan.rent_vs_buy(1800, rent_increase=.03, num_years_analysis=10)
+
+    owner, renter = simulate_rent_vs_buy(loan, 1800, .03, appr_vol=0, mkt_vol=0, n_paths=20, chunk_size=7)
+    assert np.allclose(owner['p50'], df_year['return_total']), "Zero volatility owner paths DO NOT match rent_vs_buy"
+    assert np.allclose(renter['p50'], df_rent_year['return_total']), "Zero volatility renter paths DO NOT match rent_vs_buy"
+
+    run_a = simulate_rent_vs_buy(loan, 1800, .03, n_paths=500, seed=42)[0]
+    run_b = simulate_rent_vs_buy(loan, 1800, .03, n_paths=500, seed=42)[0]
+    assert run_a.equals(run_b), "Simulation with the same seed NOT reproducible"
+    assert (run_a['p5'] <= run_a['p95']).all(), "Percentile bands NOT ordered"
+
+
+def test_yearly_rollup(loan_data):
+    loan = loan_data['loan_obj'][0]
+    df = loan_data['loan_data'][0]
+    rollup = loan.yearly_rollup(10)
+    grouped = df[df['year'] <= 10].groupby('year')
+    assert len(rollup) == 10, "Rollup NOT truncated to num_years"
+    for stat in ('sum', 'min', 'max', 'last'):
+        assert np.allclose(rollup.xs(stat, axis=1, level=1), grouped.agg(stat)), "Rollup {} DOES NOT match groupby".format(stat)
+
+
+def test_rent_vs_buy_comparisons(loan_data):
+    loan_a, loan_b = loan_data['loan_obj']
+    df_year, df_rent_year = loan_a.rent_vs_buy(1800, rent_increase=.05, mkt_return=.07, num_years_analysis=10)
+    buy, rent, buy_year, rent_year = rent_vs_buy(loan_a, 1800, time_years=10)
+    assert np.allclose(buy_year['return_total'], df_year['return_total']), "utils rent_vs_buy DOES NOT match Loan"
+    assert np.allclose(rent_year['return_total'], df_rent_year['return_total']), "utils renter DOES NOT match Loan"
+
+    a, b, a_year, b_year = buy_vs_buy(loan_a, loan_b, time_years=10, detail=True)
+    assert len(a) == 10*12 and len(a_year) == 10, "buy_vs_buy NOT truncated to time_years"
+    assert ((a['diff'] == 0) | (b['diff'] == 0)).all(), "Both loans invest a difference in the same period"
+    assert np.allclose(a['return_total'], a['investment_net'] + a['profit']), "return_total DOES NOT include profit"
+
+
+def test_sensitivity_grid(loan_data):
+    loan = loan_data['loan_obj'][0]
+    df = loan_data['loan_data'][0]
+    grid = SensitivityGrid([250000, 300000], [.03, .05], [15, 30], [.05, .20], .03, profit_year=10)
+
+    cell = (1, 0, 1, 1, 0)
+    assert grid.pmt.shape == (2, 2, 2, 2, 1), "Grid NOT shaped by axis lengths"
+    assert np.allclose(grid.pmt[cell], loan.pmt), "Grid payment DOES NOT match Loan"
+    assert np.allclose(grid.total_interest[cell], df['interest'].sum()), "Grid total interest DOES NOT match Loan"
+    assert np.allclose(grid.profit[cell], df['profit'].iloc[10*12-1]), "Grid profit DOES NOT match Loan"
+
+    df_grid = grid.to_frame('pmt', 'asset_amt', 'rate_annual', num_years=30, down_pmt=.20)
+    assert np.allclose(df_grid.loc[300000, .03], loan.pmt), "Grid slice DOES NOT match Loan"
+
+    df_matrix = pmt_matrix(loan, bins=4)
+    assert np.allclose(df_matrix.loc[loan.amt, loan.rate_annual*100], loan.pmt), "pmt_matrix center DOES NOT match Loan"
+
+
+def test_solve_rate():
+    pmts = np.array([1264.81, 2000, 500, 10, 300000/360, 0])
+    result = solve_rate(pmts, 300000, 360)
+    expected = [npf.rate(360, -p, 300000, 0) for p in pmts[:4]]
+
+    assert np.allclose(result.value[:4], expected), "Solved rates DO NOT match npf.rate"
+    assert (result.value[2:4] < 0).all(), "Payments below pv/nper NOT solved to negative rates"
+    assert list(result.converged) == [True]*5 + [False], "Convergence status NOT reported per element"
+    assert result.value[4] == 0 and np.isnan(result.value[5]), "Zero rate or unsolvable elements NOT handled"
+
+    df = affordability_batch([60000, 120000], rate=.06)
+    assert np.allclose(df['loan_amt'], npf.pv(.06/12, 360, -df['pmt'], 0)), "Max loan amounts DO NOT match npf.pv"
+
+
+def test_benchmark_suite(tmp_path):
+    output = tmp_path / 'results.json'
+    report = run(['pmt_matrix', 'LoanBatch'], scales=[1, 3], pmt_freqs=[12], repeat=1,
+                 output=str(output), verbose=False)
+
+    assert output.exists(), "Benchmark results NOT written"
+    assert len(report['results']) == 4, "Benchmark NOT run at every scale"
+    assert all(r['wall_s'] > 0 and r['peak_bytes_per_run'] > 0 for r in report['results']), "Benchmark metrics missing"
+    runs = {(r['name'], r['scale']): r['items_per_run'] for r in report['results']}
+    assert runs[('LoanBatch', 3)] == 3 and runs[('pmt_matrix', 3)] == 1, "Memory run NOT labelled with its items"
+
+
+def test_fred_cache(tmp_path, monkeypatch):
+    calls = []
+    dates = pd.date_range('2020-01-01', '2020-12-01', freq='MS')
+
+    def fetch(self, fred_id, start_date, end_date=None, frequency=None):
+        calls.append(start_date)
+        keep = dates >= pd.Timestamp(start_date)
+        return pd.DataFrame({'date': dates[keep], 'value': np.arange(len(dates))[keep].astype(float)})
+
+    monkeypatch.setattr(FRED, '_fetch', fetch)
+    fred = FRED(cache_dir=str(tmp_path))
+    df = fred.get_fred_data('cpi', '2020-03-01', '2020-10-01', 'm')
+    assert list(df.columns) == ['date', 'cpi'] and len(df) == 8, "Cached read DOES NOT match requested range"
+
+    FRED(cache_dir=str(tmp_path)).get_fred_data('cpi', '2020-06-01', frequency='m')
+    assert len(calls) == 1, "Fresh cache NOT served without fetching"
+
+    fred.ttl['cpi'] = 0
+    fred.get_fred_data('cpi', '2020-03-01', frequency='m')
+    assert calls[-1] == '2020-12-01', "Stale cache DOES NOT fetch only from the last cached date"
+    fred.get_fred_data('cpi', '2020-01-01', frequency='m')
+    assert calls[-1] == '2020-01-01', "Earlier start_date DOES NOT refetch the full range"
+
+
+def test_fred_get_many():
+    observations = {'MORTGAGE30US': [('2020-01-01', '3.6'), ('2020-02-01', '3.4'), ('2020-03-01', '3.5')],
+                    'USACPALTT01CTGYM': [('2020-01-01', '2.5'), ('2020-02-01', '.')],
+                    'DFEDTARU': [('2020-02-01', '1.75'), ('2020-03-01', '0.25')]}
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            series_id = parse_qs(urlparse(self.path).query)['series_id'][0]
+            requests_seen.append(series_id)
+            if requests_seen.count(series_id) == 1 and series_id == 'DFEDTARU':
+                self.send_response(429)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            body = json.dumps({'observations': [{'date': d, 'value': v} for d, v in observations[series_id]]}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        fred = FRED(cache=False, max_workers=2, backoff=0)
+        fred.series_url = 'http://127.0.0.1:{}/'.format(server.server_port)
+        df = fred.get_many(['mgt_rate', 'cpi', 'ffr'], '2020-01-01', '2020-03-31', 'm')
+    finally:
+        server.shutdown()
+
+    assert list(df.columns) == ['date', 'mgt_rate', 'cpi', 'ffr'], "get_many columns NOT one per series"
+    assert len(df) == 3 and df['date'].is_monotonic_increasing, "get_many NOT aligned on date"
+    assert df['cpi'].isna().sum() == 2 and np.isnan(df['ffr'].iloc[0]), "Missing observations NOT NaN"
+    assert requests_seen.count('DFEDTARU') == 2, "Rate limited request NOT retried"
+
+    empty = fred.get_many([], '2020-01-01', '2020-03-31', 'm')
+    assert list(empty.columns) == ['date'] and empty.empty, "get_many of no series NOT an empty frame"
+
+
+def test_parse_observations():
+    observations = [{'realtime_start': '2024-01-01', 'date': '2023-01-01', 'value': '4.33'},
+                    {'realtime_start': '2024-01-01', 'date': '2023-01-02', 'value': '.'},
+                    {'realtime_start': '2024-01-01', 'date': '2023-01-03', 'value': '4.31'}]
+    df = parse_observations(observations)
+    assert list(df['date']) == [pd.Timestamp('2023-01-01'), pd.Timestamp('2023-01-03')], "Missing values NOT dropped"
+    assert df['value'].tolist() == [4.33, 4.31], "Values NOT parsed as floats"
+    assert parse_observations([]).empty, "Empty observations DO NOT give an empty dataframe"
+
+
+def test_fred_record_replay(tmp_path):
+    class StubTransport():
+        def get(self, url, params):
+            return {'observations': [{'date': '2024-01-01', 'value': '5.5'}, {'date': '2024-02-01', 'value': '5.25'}]}
+
+    recording = FRED(cache=False, transport=RecordingTransport(str(tmp_path), StubTransport()))
+    recording.api_key = 'secret'
+    df = recording.get_fred_data('ffr_fcst', '2024-01-01')
+    assert 'secret' not in ''.join(p.read_text() for p in tmp_path.iterdir()), "api_key recorded in fixtures"
+
+    replay = FRED(cache=False, transport=ReplayTransport(str(tmp_path)))
+    replay.api_key = 'other'
+    assert replay.get_fred_data('ffr_fcst', '2024-01-01').equals(df), "Replayed response DOES NOT match recording"
+    with pytest.raises(FileNotFoundError):
+        replay.get_fred_data('ffr_fcst', '2023-01-01')
+
+
+def test_fred_replay_pipeline(tmp_path):
+    dates = pd.date_range('2010-01-01', '2024-06-01', freq='MS').strftime('%Y-%m-%d')
+
+    class StubTransport():
+        def get(self, url, params):
+            start, end = params['observation_start'], params['observation_end'] or '9999'
+            return {'observations': [{'date': d, 'value': str(i + len(params['series_id']))}
+                                     for i, d in enumerate(dates) if start <= d <= end]}
+
+    # Economic_Data page pipeline, start date relative to today
+    ids = ['mgt_rate', 'home_price_index', 'afford_index', 'cpi']
+    def pipeline(fred, today):
+        prev = str((pd.Timestamp(today) - pd.DateOffset(years=5)).date())
+        return fred.get_many(ids, prev, today, 'm')
+
+    fixtures = str(tmp_path / 'fixtures')
+    recording = FRED(cache_dir=str(tmp_path / 'record'), transport=RecordingTransport(fixtures, StubTransport()))
+    pipeline(recording, '2024-03-15')
+    live = FRED(cache=False, transport=StubTransport())
+
+    cold = FRED(cache_dir=str(tmp_path / 'cold'), transport=ReplayTransport(fixtures))
+    assert pipeline(cold, '2024-06-15').equals(pipeline(live, '2024-06-15')), "Replay on another day DOES NOT match"
+
+    warm = FRED(cache_dir=str(tmp_path / 'warm'), ttl={d: 0 for d in ids}, transport=ReplayTransport(fixtures))
+    pipeline(warm, '2024-03-15')
+    assert pipeline(warm, '2024-06-15').equals(pipeline(live, '2024-06-15')), "Replay with a warm cache DOES NOT match"
+    with pytest.raises(FileNotFoundError):
+        pipeline(cold, '2018-01-01')
+
+
+def test_atomic_write(tmp_path):
+    path = str(tmp_path / 'data.json')
+    atomic_write(path, lambda f: json.dump({'a': 1}, f), mode='w')
+    with pytest.raises(ZeroDivisionError):
+        atomic_write(path, lambda f: f.write(b'partial') and 1/0)
+    with open(path) as f:
+        assert json.load(f) == {'a': 1}, "Failed write NOT kept away from path"
+    assert [p.name for p in tmp_path.iterdir()] == ['data.json'], "Temporary file NOT removed"
+
+
+def test_series_store(tmp_path):
+    store = SeriesStore(str(tmp_path))
+    store.put('mgt_rate', pd.DataFrame({'date': pd.to_datetime(['2020-01-02', '2020-01-16', '2020-02-06', '2020-03-05']),
+                                        'mgt_rate': [3.7, 3.6, 3.5, 3.3]}))
+    store.put_frame(pd.DataFrame({'date': pd.to_datetime(['2020-01-01', '2020-03-01']), 'ffr': [1.75, .25]}))
+    assert store.series_ids == ['ffr', 'mgt_rate'] and len(store.index) == 6, "Series NOT on a shared date index"
+
+    df = store.frame(['mgt_rate', 'ffr'], freq='M')
+    assert list(df.index) == [pd.Timestamp('2020-01-01'), pd.Timestamp('2020-03-01')], "Inner frame keeps missing periods"
+    assert df.loc['2020-01-01', 'mgt_rate'] == 3.6, "Period DOES NOT hold its last value"
+
+    df = store.frame(['mgt_rate', 'ffr'], end='2020-02-29', how='ffill')
+    assert df['ffr'].tolist() == [1.75]*3 and df.index[0] == pd.Timestamp('2020-01-02'), "ffill frame NOT forward filled"
+
+    monthly = SeriesStore(str(tmp_path), frequency='m')
+    monthly.put('mgt_rate', pd.DataFrame({'date': pd.to_datetime(['2020-01-01']), 'mgt_rate': [3.6]}))
+    assert len(store.frame(['mgt_rate'])) == 4 and len(monthly.frame(['mgt_rate'])) == 1, \
+        "Series at another frequency overwrote the stored series"
+
+
+def test_interpolate_series():
+    points = pd.DataFrame({'date': pd.to_datetime(['2025-01-01', '2024-01-01', '2026-01-01']), 'value': [4.0, 5.0, 3.0]})
+    df = interpolate_series(points, freq='MS')
+    assert len(df) == 25 and df['date'].iloc[0] == pd.Timestamp('2024-01-01'), "Path NOT monthly between the points"
+    assert np.allclose(df['value'].iloc[[0, 12, 24]], [5.0, 4.0, 3.0]), "Path DOES NOT pass through the points"
+    assert np.isclose(df.loc[df['date'] == '2024-07-01', 'value'].item(), 5 - 182/366), "Path NOT linear in time"
+
+    df = interpolate_series(points, freq='QS', method='step')
+    assert df['value'].tolist() == [5.0]*4 + [4.0]*4 + [3.0], "Step path DOES NOT hold the previous point"
+
+
+def test_linreg_fast_cv():
+    rng = np.random.default_rng(0)
+    x = pd.DataFrame({'ffr': rng.uniform(0, 5, 120), 'cpi': rng.uniform(0, 8, 120)})
+    y = 2 + .8*x['ffr'] + .1*x['cpi'] + rng.normal(0, .3, 120)
+    for time_series_split in (True, False):
+        lm = LinReg(x, y, time_series_split=time_series_split)
+        df, df_fast = lm.test(), lm.test(fast=True)
+        assert df['folds'].tolist() == df_fast['folds'].tolist(), "Fast CV folds DO NOT match"
+        assert np.allclose(df.iloc[:, 1:].to_numpy(float), df_fast.iloc[:, 1:].to_numpy(float)), "Fast CV table DOES NOT match OLS"
+
+
+def test_linreg_cache(tmp_path, monkeypatch):
+    rng = np.random.default_rng(1)
+    x = pd.DataFrame({'ffr': rng.uniform(0, 5, 60)})
+    y = pd.Series(2 + .8*x['ffr'] + rng.normal(0, .3, 60), name='mgt_rate')
+    lm = LinReg(x, y, cache_dir=str(tmp_path))
+    df_test = lm.test(fast=True)
+    lm.train()
+    x_new = sm.add_constant(pd.DataFrame({'ffr': [1.0, 2.0]}), has_constant='add')
+
+    def refit(*args, **kwargs):
+        raise AssertionError('refit')
+    monkeypatch.setattr(sm, 'OLS', refit)
+    cached = LinReg(x, y, cache_dir=str(tmp_path))
+    assert cached.test().equals(df_test), "Cached CV table NOT reused"
+    cached.train()
+    assert np.allclose(cached.predict(x_new), lm.predict(x_new)), "Cached model predictions DO NOT match"
+
+    loaded = LinReg.load(lm.save(str(tmp_path / 'model.pkl')))
+    assert np.allclose(loaded.predict(x_new), lm.predict(x_new)), "Loaded model predictions DO NOT match"
+    assert LinReg(x*2, y).fingerprint() != lm.fingerprint(), "Fingerprint NOT sensitive to data"
+    assert LinReg(x, y, num_splits=3).fingerprint() != lm.fingerprint(), "Fingerprint NOT sensitive to hyperparameters"
+
+    (tmp_path / ('linreg_' + '0'*24 + '.pkl')).write_bytes(b'')
+    for i in range(4):
+        updated = LinReg(x + i, y, cache_dir=str(tmp_path), cache_keep=2)
+        path = updated.save()
+    saved = [p.name for p in tmp_path.glob('linreg_*.pkl')]
+    assert len(saved) == 2 and os.path.basename(path) in saved, "Stale fingerprints NOT pruned to cache_keep"
+
+
+def test_online_linreg():
+    rng = np.random.default_rng(2)
+    x = pd.DataFrame({'ffr': rng.uniform(0, 5, 80), 'cpi': rng.uniform(0, 8, 80)})
+    y = pd.Series(2 + .8*x['ffr'] + .1*x['cpi'] + rng.normal(0, .3, 80))
+    x_new = sm.add_constant(pd.DataFrame({'ffr': [1.0, 3.0], 'cpi': [2.0, 5.0]}), has_constant='add')
+
+    online = OnlineLinReg(x.iloc[:20], y.iloc[:20])
+    online.train()
+    assert online.refresh(x, y) == 60 and online.refresh(x, y) == 0, "Refresh DOES NOT apply only new rows"
+    lm = LinReg(x, y)
+    lm.train()
+    assert np.allclose(online.predict(x_new), lm.predict(x_new)), "Online intervals DO NOT match LinReg"
+
+    forgetful = OnlineLinReg(x.iloc[:20], y.iloc[:20], forgetting=.97)
+    forgetful.train()
+    forgetful.refresh(x, y)
+    batch = OnlineLinReg(x, y, forgetting=.97)
+    batch.train()
+    assert np.allclose(forgetful.params, batch.params), "Forgetting updates DO NOT match weighted fit"
+    assert np.isclose(forgetful.ssr, batch.ssr), "Forgetting residual variance DOES NOT match weighted fit"
+
+
+def test_backtest():
+    rng = np.random.default_rng(3)
+    dates = pd.date_range('2010-01-01', periods=120, freq='MS', name='date')
+    x = pd.DataFrame({'ffr': rng.uniform(0, 5, 120)}, index=dates)
+    y = pd.Series(2 + .8*x['ffr'] + rng.normal(0, .3, 120), index=dates)
+    df, summary = backtest(x, y, horizons=12, min_train=36, n_jobs=3)
+    assert summary['horizon'].tolist() == list(range(1, 13)), "Summary NOT by horizon"
+    assert summary['n'].iloc[0] == 120 - 36 and summary['n'].iloc[-1] == 120 - 36 - 11, "Forecasts past the data NOT dropped"
+    assert summary['coverage'].between(.85, 1).all(), "Interval coverage NOT near 95%"
+
+    lm = LinReg(x.iloc[:50], y.iloc[:50])
+    lm.train()
+    preds = lm.predict(sm.add_constant(x.iloc[50:62], has_constant='add'))
+    origin = df[df['origin'] == dates[50]]
+    assert np.allclose(origin[['mean', 'obs_ci_lower', 'obs_ci_upper']], preds), "Backtest DOES NOT match LinReg at origin"
+    assert backtest(x, y, horizons=12, min_train=36)[0].equals(df), "n_jobs changes backtest results"
+
+
+def test_figure_cache():
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    draws = []
+
+    def line_plot(df, title):
+        draws.append(title)
+        fig, ax = plt.subplots()
+        ax.plot(df['x'], df['y'])
+        ax.set_title(title)
+        return fig
+
+    cache = FigureCache()
+    df = pd.DataFrame({'x': [1, 2, 3], 'y': [3.0, 1.0, 2.0]})
+    png = cache.render(line_plot, df, 'A')
+    assert png.startswith(b'\x89PNG') and cache.render(line_plot, df.copy(), 'A') == png, "Cached PNG NOT served"
+    assert len(draws) == 1, "Unchanged figure redrawn"
+    cache.render(line_plot, df.assign(y=[3.0, 1.0, 2.5]), 'A')
+    cache.render(line_plot, df, 'B')
+    assert len(draws) == 3, "Changed data or arguments NOT redrawn"
+    assert cache.render(line_plot, df, 'A', fmt='svg').lstrip().startswith(b'<?xml'), "SVG NOT rendered"
+
+    def other_line_plot(df, title):
+        draws.append(title)
+        return line_plot(df.assign(y=-df['y']), title)
+    other_line_plot.__qualname__ = line_plot.__qualname__
+    other_line_plot.__module__ = 'pages.other'
+    assert cache.render(other_line_plot, df, 'A') != png, "Same named function of another module served its image"
+
+    small = FigureCache(max_bytes=len(png) + 1)
+    small.render(line_plot, df, 'A')
+    small.render(line_plot, df, 'B')
+    assert len(small) == 1 and small.nbytes <= small.max_bytes, "Byte budget NOT enforced"
+
+
+def test_loan_plot_labels(loan_data):
+    import matplotlib
+    matplotlib.use('Agg')
+    loan = loan_data['loan_obj'][0]
+    lp = LoanPlots(loan, 15)
+    data = lp.payment_data()
+    ax = lp.payment(datalabels=5).axes[0]
+    totals = [t for t in ax.texts if t.get_text().endswith('K')]
+    assert [t.get_position()[0] for t in totals] == [1, 6, 11], "Total labels NOT on every datalabels year"
+    segments = [t for t in ax.texts if not t.get_text().endswith('K')]
+    assert len(segments) == (data.loc[[1, 6, 11]] > 0).to_numpy().sum(), "Segment labels DO NOT match stacked data"
+
+    waterfall = lp.waterfall_data()
+    assert np.isclose(waterfall['value'].iloc[:-1].sum(), waterfall['value'].iloc[-1]), "Waterfall DOES NOT sum to profit"
+
+    lp = LoanPlots(loan, 15, backend='altair')
+    for chart in (lp.payment(), lp.profit(), lp.home_value(.03), lp.profit_waterfall()):
+        assert '$schema' in chart.to_dict(), "Altair chart NOT a Vega-Lite spec"
+
+
+def test_service_cache(loan_data):
+    loan_inputs = LoanInput(asset_amt=300000, rate_annual=.03, num_years=30, pmt_freq=12, down_pmt=.20,
+                            closing_cost=0, closing_cost_finance=False, prop_tax_rate=.01, pmi_rate=.01,
+                            maint_rate=.01, home_value_appreciation=.03, home_sale_percent=.06).model_dump()
+    loan = loan_data['loan_obj'][0]
+    assert service.amortize(loan_inputs).equals(loan.amort_table), "Cached amortization DOES NOT match Loan"
+
+    df_year, _ = service.rent_vs_buy(loan_inputs, 1800, .05, .07, num_years_analysis=10)
+    expected, _ = loan.rent_vs_buy(1800, rent_increase=.05, mkt_return=.07, num_years_analysis=10)
+    assert df_year.equals(expected), "Cached rent_vs_buy DOES NOT match Loan"
+
+    down_pmts = (.1, .2, .3)
+    cdp = CompareDownPayments(loan, list(down_pmts))
+    cdp.sweep_down_pmts(mkt_return=.07)
+    summary = service.down_pmt_summary(loan_inputs, down_pmts, .07, 10)
+    assert summary.equals(cdp.get_summary(10)), "Cached down payment summary DOES NOT match sweep"
+    a, b = (service.down_pmt_sweep(loan_inputs, down_pmts, .07) for _ in range(2))
+    a.get_summary(5)
+    assert a is not b and not hasattr(b, 'years_compare'), "Down payment sweep state shared between callers"
+
+
+def test_import_time_dependencies():
+    code = ("import sys, loan, utils.npf_amort, econ, models; "
+            "print(' '.join(m for m in ('matplotlib', 'altair', 'streamlit', 'dotenv', 'sklearn', 'statsmodels', 'scipy') "
+            "if m in sys.modules))")
+    out = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                         capture_output=True, text=True, check=True).stdout.split()
+    assert out == [], "Heavy modules imported at import time: {}".format(out)
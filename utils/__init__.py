@@ -1,2 +1,6 @@
 from .npf_amort import amort
-from .utils import expected_value_cagr, affordability_calc
\ No newline at end of file
+from .utils import expected_value_cagr, affordability_calc, affordability_batch
+from .grid import SensitivityGrid
+from .figure_cache import FigureCache, figure_cache
+from .files import atomic_write
+from .lru import LRUCache
@@ -0,0 +1,49 @@
+import numpy as np
+
+
+def market_growth(mkt_return: float, pmt_freq: int, nper: int) -> np.ndarray:
+    '''
+    Cumulative growth factor of the market compounded pmt_freq times a year for nper periods
+    '''
+    return np.full(nper, 1+(mkt_return/pmt_freq)).cumprod()
+
+
+def invest_difference(costs: np.ndarray, growth: np.ndarray, cap_gains_tax: float=0, base: np.ndarray=None) -> dict:
+    '''
+    Compares K options where each period the options cheaper than the most expensive one invest the difference
+
+    Parameters
+    ----------
+    costs : all in costs by period, shape (..., K, n_periods)
+    growth : cumulative market growth factor, shape (n_periods,) or broadcastable to costs e.g. (..., 1, n_periods)
+    cap_gains_tax : capital gains tax deducted from market returns
+    base : value of each option added to the net investment for return_total (e.g. profit), broadcastable to costs
+
+    Returns dict of (..., K, n_periods) arrays
+        diff - difference to the most expensive option, invested in the market
+        diff_cumulative - cumulative invested difference
+        mkt_return - cumulative invested difference times market growth
+        cap_gains_cumulative - mkt_return less diff_cumulative
+        cap_gains_tax - tax on cap_gains_cumulative
+        mkt_return_net - mkt_return less cap_gains_tax
+        return_total - mkt_return_net + base
+    '''
+    costs = np.asarray(costs, dtype=float)
+    diff = np.clip(costs.max(axis=-2, keepdims=True) - costs, 0, None)
+    diff_cumulative = diff.cumsum(axis=-1)
+    mkt_return = diff_cumulative * growth
+    cap_gains_cumulative = mkt_return - diff_cumulative
+    cap_gains = cap_gains_cumulative * cap_gains_tax
+    mkt_return_net = mkt_return - cap_gains
+    return_total = mkt_return_net if base is None else mkt_return_net + base
+
+    return {'diff': diff, 'diff_cumulative': diff_cumulative, 'mkt_return': mkt_return,
+            'cap_gains_cumulative': cap_gains_cumulative, 'cap_gains_tax': cap_gains,
+            'mkt_return_net': mkt_return_net, 'return_total': return_total}
+
+
+def yearly_max(values: np.ndarray, pmt_freq: int) -> np.ndarray:
+    '''
+    Max of values within each year along the last axis (n_periods must be whole years)
+    '''
+    return values.reshape(values.shape[:-1] + (-1, pmt_freq)).max(axis=-1)
@@ -0,0 +1,81 @@
+import hashlib
+import io
+import threading
+import numpy as np
+import pandas as pd
+
+from .lru import LRUCache
+
+
+def _update(h, obj) -> None:
+    if isinstance(obj, pd.DataFrame):
+        h.update(repr(list(obj.columns)).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif isinstance(obj, pd.Series):
+        h.update(repr(obj.name).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif isinstance(obj, np.ndarray):
+        h.update('{}{}'.format(obj.dtype.str, obj.shape).encode())
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, (list, tuple)):
+        h.update('{}{}'.format(type(obj).__name__, len(obj)).encode())
+        for o in obj:
+            _update(h, o)
+    elif isinstance(obj, dict):
+        h.update('dict{}'.format(len(obj)).encode())
+        for k in sorted(obj, key=repr):
+            _update(h, k)
+            _update(h, obj[k])
+    else:
+        h.update(repr(obj).encode())
+
+
+def figure_key(*parts) -> str:
+    '''
+    Hash of plotted data (dataframes, series, arrays) and styling arguments
+    '''
+    h = hashlib.sha256()
+    for part in parts:
+        _update(h, part)
+    return h.hexdigest()
+
+
+class FigureCache(LRUCache):
+    '''
+    LRU cache of rendered figures (PNG or SVG bytes) keyed by the plotted data and arguments
+
+    max_bytes : max total size of cached images, least recently used are evicted first
+
+    Hits skip drawing entirely. Misses draw the figure, save it and close it so figures
+    don't accumulate in pyplot. Drawing is serialized since pyplot isn't thread safe.
+    '''
+
+    def __init__(self, max_bytes: int=64*1024**2) -> None:
+        assert max_bytes > 0, 'max_bytes must be greater than 0'
+        super().__init__(max_bytes=max_bytes)
+        self._draw_lock = threading.Lock()
+
+    def render(self, draw, *args, data=None, fmt: str='png', dpi: int=100, **kwargs) -> bytes:
+        '''
+        Returns the image bytes of draw(*args, **kwargs), a function returning a matplotlib figure
+
+        data : state the figure depends on that isn't in args, e.g. LoanPlots.rollup for its methods
+        '''
+        assert fmt in ('png', 'svg'), "fmt must be 'png' or 'svg'"
+        key = figure_key(getattr(draw, '__module__', None), getattr(draw, '__qualname__', repr(draw)), data, args, kwargs, fmt, dpi)
+        image = self.get(key)
+        if image is not None:
+            return image
+
+        import matplotlib.pyplot as plt
+        with self._draw_lock:
+            fig = draw(*args, **kwargs)
+            buf = io.BytesIO()
+            fig.savefig(buf, format=fmt, dpi=dpi, bbox_inches='tight')
+            plt.close(fig)
+        image = buf.getvalue()
+        self.put(key, image, len(image))
+        return image
+
+
+figure_cache = FigureCache()
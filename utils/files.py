@@ -0,0 +1,24 @@
+import os
+
+
+def atomic_write(path: str, writer, mode: str='wb') -> None:
+    '''
+    Writes a file through a temporary file replaced into path, so readers never see a partial file
+
+    The temporary file is removed if writer raises
+
+    Parameters
+    ----------
+    path : destination file
+    writer : function taking the open file object and writing the contents, e.g. lambda f: pickle.dump(obj, f)
+    mode : 'wb' for binary writers, 'w' for text
+    '''
+    tmp = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        with open(tmp, mode) as f:
+            writer(f)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
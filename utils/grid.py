@@ -0,0 +1,104 @@
+import numpy as np
+import numpy_financial as npf
+import pandas as pd
+
+from .npf_amort import balance
+
+
+class SensitivityGrid():
+    '''
+    Payment, total interest and profit over every combination of loan inputs
+
+    Each of the grid axes (asset_amt, rate_annual, num_years, down_pmt, home_value_appreciation)
+    can be a scalar or 1-D array. Results are arrays of shape
+    (len(asset_amt), len(rate_annual), len(num_years), len(down_pmt), len(home_value_appreciation))
+    computed in closed form by broadcasting, so no amortization table is built per cell.
+
+    Results:
+        pmt - mortgage payment
+        total_interest - interest paid over the full loan
+        profit - profit at the end of profit_year, same definition as profit in Loan.amort_table_detail
+
+    The remaining LoanInput fields are fixed for the whole grid. profit assumes home values don't
+    decrease (home_value_appreciation >= 0, as required by LoanInput) so PMI is only paid until the
+    loan to value ratio first drops to 80%.
+    '''
+
+    axis_names = ('asset_amt', 'rate_annual', 'num_years', 'down_pmt', 'home_value_appreciation')
+
+    def __init__(self, asset_amt, rate_annual, num_years, down_pmt=0, home_value_appreciation=.03,
+                 profit_year: int=None, pmt_freq: int=12, closing_cost: float=0, closing_cost_finance: bool=False,
+                 prop_tax_rate: float=.01, maint_rate: float=.01, home_sale_percent: float=.06) -> None:
+
+        values = (asset_amt, rate_annual, num_years, down_pmt, home_value_appreciation)
+        self.axes = {name: np.atleast_1d(np.asarray(v, dtype=int if name == 'num_years' else float))
+                     for name, v in zip(self.axis_names, values)}
+        for name, v in self.axes.items():
+            assert v.ndim == 1, '{} must be a scalar or 1-D array'.format(name)
+        self.profit_year = int(self.axes['num_years'].min()) if profit_year is None else profit_year
+        assert 0 < self.profit_year <= self.axes['num_years'].min(), 'profit_year must be within every num_years'
+        self.pmt_freq = pmt_freq
+
+        n = len(self.axis_names)
+        asset, rate_annual, num_years, down, appr = [v.reshape([-1 if i == j else 1 for j in range(n)])
+                                                      for i, v in enumerate(self.axes.values())]
+        rate = rate_annual / pmt_freq
+        nper = num_years * pmt_freq
+        amt = asset*(1-down) + (closing_cost if closing_cost_finance else 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pmt = -npf.pmt(rate, nper, amt)
+        self.shape = np.broadcast_shapes(*(v.shape for v in (asset, rate, num_years, down, appr)))
+        self.pmt = np.broadcast_to(pmt, self.shape)
+        self.total_interest = np.broadcast_to(pmt*nper - amt, self.shape)
+
+        # profit at period k
+        k = self.profit_year * pmt_freq
+        growth = 1 + appr/pmt_freq
+        cum_interest = k*pmt - (amt - balance(amt, rate, k, pmt))
+
+        # first period with ltv_ratio <= .8, binary search over periods 1..k (k+1 if never reached)
+        lo = np.ones(np.broadcast_shapes(pmt.shape, growth.shape), dtype=int)
+        hi = np.full(lo.shape, k + 1)
+        while (lo < hi).any():
+            mid = (lo + hi) // 2
+            below = balance(amt, rate, mid, pmt) <= .8 * asset * growth**mid
+            hi = np.where(below & (lo < hi), mid, hi)
+            lo = np.where(~below & (lo < hi), mid + 1, lo)
+        pmi = (lo - 1) * amt*.01/pmt_freq
+
+        # prop_tax and maint use the home value at the start of each year, a geometric series
+        q = growth**pmt_freq
+        with np.errstate(divide='ignore', invalid='ignore'):
+            years = np.where(q == 1, self.profit_year, (q**self.profit_year - 1)/(q - 1))
+        tax_maint = pmt_freq*(prop_tax_rate + maint_rate)/12 * asset*growth * years
+        closing = 0 if closing_cost_finance else closing_cost
+
+        home_value = asset * growth**k
+        cum_costs = cum_interest + pmi + tax_maint + closing
+        self.profit = np.broadcast_to(home_value*(1-home_sale_percent) - cum_costs - asset*down - amt, self.shape)
+
+    def to_frame(self, values: str='pmt', index: str='asset_amt', columns: str='rate_annual', **fixed) -> pd.DataFrame:
+        '''
+        Returns a 2-D slice of values ('pmt', 'total_interest' or 'profit') as a DataFrame
+
+        Axes other than index and columns with more than one value must be fixed by keyword,
+        e.g. to_frame('profit', 'down_pmt', 'rate_annual', num_years=30)
+        '''
+        data = getattr(self, values)
+        selection = []
+        for name, axis in self.axes.items():
+            if name in (index, columns):
+                selection.append(slice(None))
+            elif name in fixed:
+                match = np.flatnonzero(np.isclose(axis, fixed[name]))
+                assert len(match) > 0, '{}={} is not on the grid'.format(name, fixed[name])
+                selection.append(match[0])
+            else:
+                assert len(axis) == 1, '{} has more than one value, pass it as a keyword'.format(name)
+                selection.append(0)
+        data = data[tuple(selection)]
+        if self.axis_names.index(index) > self.axis_names.index(columns):
+            data = data.T
+        return pd.DataFrame(data, index=pd.Index(self.axes[index], name=index),
+                            columns=pd.Index(self.axes[columns], name=columns))
+
@@ -0,0 +1,68 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache():
+    '''
+    Thread safe LRU store of values with a size in bytes, shared by LoanCache and FigureCache
+
+    maxsize : optional max number of entries
+    max_bytes : optional max total size of entries, least recently used are evicted first.
+        Values larger than max_bytes on their own are not cached.
+
+    Subclasses build keys and values, get() and put() count hits and misses and enforce the limits.
+    '''
+
+    def __init__(self, maxsize: int=None, max_bytes: int=None) -> None:
+        assert maxsize is None or maxsize > 0, 'maxsize must be greater than 0'
+        assert max_bytes is None or max_bytes > 0, 'max_bytes must be greater than 0'
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        '''
+        Cached value of key marked most recently used, else default (counted as a miss)
+        '''
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+            return default
+
+    def put(self, key, value, nbytes: int) -> None:
+        '''
+        Caches value of nbytes under key, a key cached meanwhile by another thread is kept
+        '''
+        with self._lock:
+            if key in self._entries or (self.max_bytes is not None and nbytes > self.max_bytes):
+                return
+            self._entries[key] = (value, nbytes)
+            self.nbytes += nbytes
+            self._evict()
+
+    def _evict(self) -> None:
+        while (self.maxsize is not None and len(self._entries) > self.maxsize) or \
+                (self.max_bytes is not None and self.nbytes > self.max_bytes):
+            _, (_, nbytes) = self._entries.popitem(last=False)
+            self.nbytes -= nbytes
+
+    def info(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries),
+                'maxsize': self.maxsize, 'nbytes': self.nbytes, 'max_bytes': self.max_bytes}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
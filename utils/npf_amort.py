@@ -3,6 +3,17 @@ import numpy as np
 import numpy_financial as npf
 import pandas as pd
 
+def balance(pv, rate, nper, pmt):
+    '''
+    Closed form balance of a loan of pv after nper payments of pmt at periodic rate
+
+    Broadcasts over array inputs, a rate of 0 reduces to pv - pmt*nper
+    '''
+    d = (1 + rate) ** nper
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = np.where(rate == 0, nper, (d - 1)/rate)
+    return pv * d - pmt*growth
+
 def amort(amt, nper, pmt, pmt_freq, rate):
     periods = np.arange(1, nper + 1, dtype=int)
     year_func = np.vectorize(lambda x: x // pmt_freq if x % pmt_freq == 0 else x // pmt_freq + 1)
@@ -11,10 +22,6 @@ def amort(amt, nper, pmt, pmt_freq, rate):
     interest = -npf.ipmt(rate, periods, nper, amt)
     principal = -npf.ppmt(rate, periods, nper, amt)
 
-    def balance(pv, rate, nper, pmt):
-        d = (1 + rate) ** nper
-        return pv * d - pmt*(d - 1)/rate
-    
     beg_bal = balance(amt, rate, periods - 1, pmt)
     end_bal = balance(amt, rate, periods, pmt)
 
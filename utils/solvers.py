@@ -0,0 +1,78 @@
+import numpy as np
+from typing import NamedTuple
+
+
+class SolverResult(NamedTuple):
+    '''
+    value - solution of each element (nan where not converged)
+    converged - True where the solver met the tolerance within max_iter
+    iterations - iterations used by each element
+    '''
+    value: np.ndarray
+    converged: np.ndarray
+    iterations: np.ndarray
+
+
+def annuity_pmt(rate, nper, pv):
+    '''
+    Payment of a loan of pv over nper periods at periodic rate, vectorized with rate 0 handled
+    '''
+    rate, nper, pv = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (rate, nper, pv)))
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        pmt = pv*rate / (1 - (1 + rate)**-nper)
+    return np.where(rate == 0, pv/nper, pmt)
+
+
+def max_loan_amt(pmt, rate, nper) -> SolverResult:
+    '''
+    Largest loan (present value) that pmt per period pays off over nper periods at periodic rate
+    '''
+    pmt, rate, nper = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (pmt, rate, nper)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pv = np.where(rate == 0, pmt*nper, pmt*(1 - (1 + rate)**-nper)/rate)
+    converged = np.isfinite(pv)
+    return SolverResult(np.where(converged, pv, np.nan), converged, np.zeros(pv.shape, dtype=int))
+
+
+def solve_rate(pmt, pv, nper, tol: float=1e-10, max_iter: int=50) -> SolverResult:
+    '''
+    Periodic rate at which pmt per period pays off pv over nper periods
+
+    Newton's method on annuity_pmt(rate) - pmt, falling back to bisection whenever a Newton step
+    leaves the bracket, [0, pmt/pv] or (-1, 0] when pmt < pv/nper. Payments that don't cover the
+    principal solve to negative rates as with npf.rate. Elements without a positive pv and pmt or
+    that don't reach tol within max_iter are reported as not converged.
+    '''
+    pmt, pv, nper = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (pmt, pv, nper)))
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        positive = pmt*nper >= pv
+        lo = np.where(positive, 0, -1.)
+        hi = np.where(positive, pmt / pv, 0)
+        solvable = (pv > 0) & (pmt > 0)
+        # negative rates start from the small rate approximation pmt ~ pv/nper*(1 + rate*(nper + 1)/2)
+        guess = np.where(positive, hi/2, np.maximum(2*(pmt*nper/pv - 1)/(nper + 1), -.5))
+        rate = np.where(solvable, guess, np.nan)
+        converged = solvable & np.isclose(pmt*nper, pv, rtol=tol, atol=0)
+        rate = np.where(converged, 0, rate)
+        iterations = np.zeros(pmt.shape, dtype=int)
+
+        for _ in range(max_iter):
+            active = solvable & ~converged
+            if not active.any():
+                break
+            iterations += active
+
+            f = annuity_pmt(rate, nper, pv) - pmt
+            v = (1 + rate)**-nper
+            df = pv*((1 - v) - rate*nper*v/(1 + rate)) / (1 - v)**2
+            lo = np.where(active & (f < 0), rate, lo)
+            hi = np.where(active & (f > 0), rate, hi)
+
+            newton = rate - f/df
+            step_ok = np.isfinite(newton) & (newton > lo) & (newton < hi)
+            new_rate = np.where(step_ok, newton, (lo + hi)/2)
+            done = (np.abs(f) <= tol*pmt) | (np.abs(new_rate - rate) <= tol*np.maximum(np.abs(rate), tol))
+            converged = converged | (active & done)
+            rate = np.where(active, new_rate, rate)
+
+    return SolverResult(np.where(converged, rate, np.nan), converged, iterations)
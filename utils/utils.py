@@ -1,7 +1,9 @@
 import pandas as pd
 import numpy as np
 import numpy_financial as npf
-import matplotlib.pyplot as plt
+
+from .solvers import solve_rate, max_loan_amt
+from .compare import invest_difference, market_growth, yearly_max
 
 
 def expected_value_cagr(start_value, end_value, years):
@@ -11,31 +13,59 @@ def expected_value_cagr(start_value, end_value, years):
     cagr = (end_value/start_value)**(1/years) - 1
     return cagr
 
-def affordability_calc(gross_income, rate=0, amt=0, pmt_percent=.28, bins=16, amt_incrmt=10000, rate_incrmt=.0025):
+def affordability_calc(gross_income, rate=0, amt=0, pmt_percent=.28, bins=16, amt_incrmt=10000, rate_incrmt=.0025,
+                       num_years=30, pmt_freq=12):
     '''
     Returns dataframe of varying asset amounts and rates based on a fixed payment that is calculated as a % of gross income
     '''
-    pmt = gross_income/12 * pmt_percent
-    def calc_rate(amt):
-        return npf.rate(360, -pmt, amt, 0)*12*100
-    def calc_amt(rate):
-        return npf.pv(rate/12/100, 360, -pmt, 0)
+    pmt = gross_income/pmt_freq * pmt_percent
+    nper = num_years*pmt_freq
     df = pd.DataFrame()
     if amt == 0:
         rates = np.linspace(rate*100 - ((bins/2)*rate_incrmt*100), rate*100 + ((bins/2)*rate_incrmt*100), num=bins+1)
+        result = max_loan_amt(pmt, rates/pmt_freq/100, nper)
         df['rates'] = rates
-        df['loan_amts'] = pd.Series(rates).apply(calc_amt)
+        df['loan_amts'] = result.value
     else:
         amts = np.linspace(amt - ((bins/2)*amt_incrmt), amt + ((bins/2)*amt_incrmt), num=bins+1)
+        result = solve_rate(pmt, amts, nper)
         df['loan_amts'] = amts
-        df['rates'] = pd.Series(amts).apply(calc_rate)
+        df['rates'] = result.value*pmt_freq*100
+    df['converged'] = result.converged
     df['gross_income'] = gross_income
     df['gross_income_mthly'] = gross_income/12
     df['percent_gross_income'] = pmt_percent
-    df['pmt_monthly'] = pmt    
+    df['pmt_monthly'] = gross_income/12 * pmt_percent
     
     return df
 
+def affordability_batch(gross_income, rate=None, amt=None, pmt_percent=.28, num_years=30, pmt_freq=12):
+    '''
+    Affordability for arrays of applicants in one vectorized pass
+
+    Pass rate (annual) to get the max loan amount each gross_income affords, or amt to get the
+    annual rate at which each amt is affordable. All arguments broadcast against gross_income.
+
+    Returns dataframe with one row per applicant and the solver's converged/iterations columns
+    '''
+    assert (rate is None) != (amt is None), 'Pass exactly one of rate or amt'
+    gross_income = np.asarray(gross_income, dtype=float)
+    pmt = gross_income/pmt_freq * np.asarray(pmt_percent)
+    nper = np.asarray(num_years)*pmt_freq
+    if amt is None:
+        result = max_loan_amt(pmt, np.asarray(rate)/pmt_freq, nper)
+        rates, amts = np.broadcast_to(rate, result.value.shape), result.value
+    else:
+        result = solve_rate(pmt, amt, nper)
+        rates, amts = result.value*pmt_freq, np.broadcast_to(amt, result.value.shape)
+    df = pd.DataFrame({'gross_income': np.broadcast_to(gross_income, result.value.shape),
+                       'pmt': np.broadcast_to(pmt, result.value.shape),
+                       'rate': rates,
+                       'loan_amt': amts,
+                       'converged': result.converged,
+                       'iterations': result.iterations})
+    return df
+
 def rent_vs_buy(loan, rent_start, time_years=10, rent_growth=.05, market_returns=.07, cap_gains_tax=.15):
     '''
     Compares net returns of buying a home vs renting. Whichever option has a lower all in monthly cost,
@@ -57,40 +87,24 @@ def rent_vs_buy(loan, rent_start, time_years=10, rent_growth=.05, market_returns
     4. Yearly view of rent option
     '''
     assert loan.num_years >= time_years, 'Loan arg num_years shorter than time_years'
-    
-    df = loan.amort_table_detail()
 
-    df_rent = pd.DataFrame(data=((1+rent_growth)**(df['year'] - 1)) * rent_start).rename(columns={'year':'rent'})
-    df_rent['year'] = df['year']
+    nper = time_years * loan.pmt_freq
+    df = loan.amort_table_detail().iloc[:nper]
+    year = df['year'].to_numpy()
+    profit = df['profit'].to_numpy()
 
-    df['diff'] = df_rent['rent'] - df['all_in_pmts']
-    df['diff'] = df['diff'].apply(lambda x: x if x > 0 else 0)
+    rent = ((1+rent_growth)**(year - 1)) * rent_start
+    rent_cumulative = rent.cumsum()
+    result = invest_difference(np.stack([df['all_in_pmts'].to_numpy(), rent]),
+                               market_growth(market_returns, loan.pmt_freq, nper), cap_gains_tax,
+                               base=np.stack([profit, -rent_cumulative]))
 
-    df_rent['diff'] = df['all_in_pmts'] - df_rent['rent']
-    df_rent['diff'] = df_rent['diff'].apply(lambda x: x if x > 0 else 0)
+    df = pd.DataFrame({'year': year, 'profit': profit, 'returns_net': result['mkt_return_net'][0],
+                       'return_total': result['return_total'][0]})
+    df_rent = pd.DataFrame({'year': year, 'rent_cumulative': rent_cumulative, 'returns_net': result['mkt_return_net'][1],
+                            'return_total': result['return_total'][1]})
 
-    df['market_returns'] = df['diff'].cumsum() * np.array([1+(market_returns/loan.pmt_freq)]*loan.nper).cumprod()
-    df['diff_cumulative'] = df['diff'].cumsum()
-    df['cap_gains_cumulative'] = df['market_returns'] - df['diff_cumulative']
-    df['cap_gains_tax'] = df['cap_gains_cumulative'] * cap_gains_tax
-    df['returns_net'] = df['market_returns'] - df['cap_gains_tax']
-    df['return_total'] = df['returns_net'] + df['profit']
-
-    df_rent['market_returns'] = df_rent['diff'].cumsum() * np.array([1+(market_returns/loan.pmt_freq)]*loan.nper).cumprod()
-    df_rent['diff_cumulative'] = df_rent['diff'].cumsum()
-    df_rent['cap_gains_cumulative'] = df_rent['market_returns'] - df_rent['diff_cumulative']
-    df_rent['cap_gains_tax'] = df_rent['cap_gains_cumulative'] * cap_gains_tax
-    df_rent['returns_net'] = df_rent['market_returns'] - df_rent['cap_gains_tax']
-    df_rent['rent_cumulative'] = df_rent['rent'].cumsum()
-    df_rent['return_total'] = df_rent['returns_net'] - df_rent['rent_cumulative']
-
-    cols_df = ['year', 'profit', 'returns_net', 'return_total']
-    cols_rent = ['year', 'rent_cumulative', 'returns_net', 'return_total']
-
-    df_year = df.loc[:, cols_df].groupby('year').max()
-    df_rent_year = df_rent.loc[:, cols_rent].groupby('year').max()
-    
-    return (df.loc[:time_years*12-1, cols_df], df_rent.loc[:time_years*12-1,cols_rent], df_year.iloc[:time_years,:], df_rent_year.iloc[:time_years,:])
+    return (df, df_rent, _yearly(df, loan.pmt_freq), _yearly(df_rent, loan.pmt_freq))
 
 
 def buy_vs_buy(loan_a, loan_b, time_years=10, market_returns=.07, cap_gains_tax=.15, detail=False):
@@ -115,40 +129,32 @@ def buy_vs_buy(loan_a, loan_b, time_years=10, market_returns=.07, cap_gains_tax=
     '''
     assert loan_a.num_years >= time_years, 'Loan A shorter than investment time'
     assert loan_b.num_years >= time_years, 'Loan B shorter than investment time'
-    
-    df_a = loan_a.amort_table_detail()
-    df_b = loan_b.amort_table_detail()
-    
-    df_a['diff'] = df_b['all_in_pmts'] - df_a['all_in_pmts']
-    df_a['diff'] = df_a['diff'].apply(lambda x: x if x > 0 else 0)
-    
-    df_b['diff'] = df_a['all_in_pmts'] - df_b['all_in_pmts']
-    df_b['diff'] = df_b['diff'].apply(lambda x: x if x > 0 else 0)
-    
-    df_a['investment'] = df_a['diff'].cumsum() * np.array([1+(market_returns/loan_a.pmt_freq)]*loan_a.nper).cumprod()
-    df_a['diff_cumulative'] = df_a['diff'].cumsum()
-    df_a['cap_gains_cumulative'] = df_a['investment'] - df_a['diff_cumulative']
-    df_a['cap_gains_tax'] = df_a['cap_gains_cumulative'] * cap_gains_tax
-    df_a['investment_net'] = df_a['investment'] - df_a['cap_gains_tax']
-    df_a['return_total'] = df_a['investment_net'] + df_a['home_sale_net']
-    
-    df_b['investment'] = df_b['diff'].cumsum() * np.array([1+(market_returns/loan_b.pmt_freq)]*loan_b.nper).cumprod()
-    df_b['diff_cumulative'] = df_b['diff'].cumsum()
-    df_b['cap_gains_cumulative'] = df_b['investment'] - df_b['diff_cumulative']
-    df_b['cap_gains_tax'] = df_b['cap_gains_cumulative'] * cap_gains_tax
-    df_b['investment_net'] = df_b['investment'] - df_b['cap_gains_tax']
-    df_b['return_total'] = df_b['investment_net'] + df_b['home_sale_net']
-    
+    assert loan_a.pmt_freq == loan_b.pmt_freq, 'Loan A and Loan B have different pmt_freq'
+
+    nper = time_years * loan_a.pmt_freq
+    dfs = [loan.amort_table_detail().iloc[:nper] for loan in (loan_a, loan_b)]
+    result = invest_difference(np.stack([df['all_in_pmts'].to_numpy() for df in dfs]),
+                               market_growth(market_returns, loan_a.pmt_freq, nper), cap_gains_tax,
+                               base=np.stack([df['profit'].to_numpy() for df in dfs]))
+
+    cols = {'investment_net': 'mkt_return_net', 'return_total': 'return_total'}
     if detail:
-        cols = ['year', 'home_sale_net', 'investment_net', 'return_total', 'diff', 'diff_cumulative', 'investment',
-                'cap_gains_cumulative', 'cap_gains_tax']
-    else:
-        cols = ['year', 'home_sale_net', 'investment_net', 'return_total']
-    
-    df_a_year = df_a[cols].groupby('year').max()
-    df_b_year = df_b[cols].groupby('year').max()
+        cols.update({'diff': 'diff', 'diff_cumulative': 'diff_cumulative', 'investment': 'mkt_return',
+                     'cap_gains_cumulative': 'cap_gains_cumulative', 'cap_gains_tax': 'cap_gains_tax'})
+
+    df_a, df_b = [pd.DataFrame({'year': df['year'].to_numpy(), 'profit': df['profit'].to_numpy(),
+                                **{k: result[v][i] for k, v in cols.items()}}) for i, df in enumerate(dfs)]
+
+    return (df_a, df_b, _yearly(df_a, loan_a.pmt_freq), _yearly(df_b, loan_b.pmt_freq))
 
-    return (df_a.loc[:time_years*12-1, cols], df_b.loc[:time_years*12-1, cols], df_a_year.iloc[:time_years,:], df_b_year.iloc[:time_years,:])
+
+def _yearly(df, pmt_freq):
+    '''
+    Max of each column within each year, indexed by year
+    '''
+    years = len(df) // pmt_freq
+    return pd.DataFrame({k: yearly_max(df[k].to_numpy(), pmt_freq) for k in df.columns if k != 'year'},
+                        index=pd.Index(np.arange(1, years + 1), name='year'))
 
 
 def plot_comparison(option_a, option_b):
@@ -157,6 +163,7 @@ def plot_comparison(option_a, option_b):
 
     Use the same time period of options when plotting (monthly vs yearly)
     '''
+    import matplotlib.pyplot as plt
     plt.plot(option_a['return_total'], label='Option A');
     plt.plot(option_b['return_total'], label='Option B');
     plt.xlim(1, option_a.shape[0]);
@@ -179,15 +186,8 @@ def pmt_matrix(self, bins=10, amt_incrmt=10000, rate_incrmt=.0025, variance=Fals
     rates = rates[rates>0]
     amts = amts[amts>0]
 
-    pmts = {'amts':[], 'rates':[], 'pmt':[]}
-    for a in amts:
-        for r in rates:
-            pmt = -npf.pmt(r/100/self.pmt_freq, self.nper, a)
-            pmts['amts'].append(a)
-            pmts['rates'].append(r)
-            pmts['pmt'].append(pmt)
-    df_pmts = pd.DataFrame(pmts)
-    df_matrix = df_pmts.pivot(index='amts', columns='rates', values='pmt')
+    pmts = -npf.pmt(rates[None, :]/100/self.pmt_freq, self.nper, amts[:, None])
+    df_matrix = pd.DataFrame(pmts, index=pd.Index(amts, name='amts'), columns=pd.Index(rates, name='rates'))
     if variance:
         df_matrix = df_matrix - self.pmt 
     return df_matrix
@@ -236,6 +236,7 @@ def plot_debt_vs_equity(self):
 
     intersection = get_intersection(p1, p2)[0]
 
+    import matplotlib.pyplot as plt
     plt.plot(df[['year', 'end_bal']].groupby('year').min(), label='Debt', color='r');
     plt.plot(df[['year', 'principal_total']].groupby('year').max(), label='Equity', color='g');
     plt.axvline(intersection, color='b');